@@ -0,0 +1,85 @@
+"""Microbenchmark of the GeoJSON encoders.
+
+Compares the original helper (`utils.format_geojson_featurecollection` +
+`json.dumps`, which is what `jsonify` did) with `geojson_encoder` on
+synthetic need rows.
+
+Usage (from the project root):
+    python api/bench_geojson.py --features 10000 100000 --repeat 5
+"""
+import argparse
+import json
+import random
+import time
+
+try:
+    from api import geojson_encoder
+    from api.utils import format_geojson_featurecollection
+except ImportError:
+    import geojson_encoder
+    from utils import format_geojson_featurecollection
+
+
+def make_rows(count, seed=42):
+    """Builds `count` rows shaped like the /needs query output."""
+    rng = random.Random(seed)
+    categories = ["food", "medical", "transport", "shelter", "other"]
+    urgencies = ["critical", "high", "medium", "low"]
+    return [
+        {
+            "need_id": i,
+            "title": f"Need {i}",
+            "descrip": "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+            "address_point": f"Rua {i}, Lisboa",
+            "user_id": rng.randint(1, 500),
+            "status": "active",
+            "urgency": rng.choice(urgencies),
+            "category": rng.choice(categories),
+            "geom": {
+                "type": "Point",
+                "coordinates": [rng.uniform(-1060000, -960000), rng.uniform(4650000, 4750000)]
+            },
+            "assignment_status": None
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(func, repeat):
+    """Returns the best wall time in seconds and the output size of `func`."""
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - t0)
+        size = len(output)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GeoJSON encoder microbenchmark")
+    parser.add_argument("--features", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = "orjson" if geojson_encoder.orjson is not None else "stdlib json"
+    whitelist = ("need_id", "title", "urgency", "category", "status")
+    cases = [
+        ("utils + json.dumps (old)", lambda rows: json.dumps(format_geojson_featurecollection(rows)).encode()),
+        (f"encoder ({backend})", lambda rows: geojson_encoder.encode_feature_collection(rows)),
+        (f"encoder ({backend}), precision=1", lambda rows: geojson_encoder.encode_feature_collection(rows, precision=1)),
+        (f"encoder ({backend}), whitelist", lambda rows: geojson_encoder.encode_feature_collection(rows, properties=whitelist)),
+    ]
+
+    for count in args.features:
+        rows = make_rows(count)
+        print(f"\n{count} features (best of {args.repeat})")
+        baseline = None
+        for name, func in cases:
+            seconds, size = best_of(lambda: func(rows), args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:<40} {seconds * 1000:9.1f} ms  {size / 1e6:7.2f} MB  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
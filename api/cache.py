@@ -0,0 +1,168 @@
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, make_response, request
+
+
+class LocalBackend:
+    """In-process LRU cache with a TTL per entry.
+
+    Entries are evicted least recently used first once `max_entries` is
+    reached, and expire `ttl` seconds after being set. Counters (used for the
+    group generations of ResponseCache) are kept apart and never evicted.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend on Redis, so every API worker sees the same entries.
+
+    Needs the optional `redis` package. Expiry and eviction are left to
+    Redis (`SETEX` and the server's maxmemory policy).
+    """
+
+    def __init__(self, url, prefix="hazard:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(self.prefix + key, ttl, pickle.dumps(value))
+
+    def counter(self, key):
+        return int(self._client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """Caches Flask GET responses by group, with group-wide invalidation.
+
+    Each group (e.g. 'reference', 'map') has a generation counter stored in
+    the backend. It is part of every key, so `invalidate(group)` only bumps
+    the counter and the old entries are never read again (they age out of
+    the LRU or expire). This also works across processes with a shared
+    backend. Only 200 responses that are not streamed are stored.
+
+    Routes that also use `conditional` (run_api.py) have their data version
+    in the key too (`g.data_version`), so a cached body always matches the
+    ETag sent with it, even before this process has been notified of a write.
+    """
+
+    def __init__(self, backend, enabled=True):
+        """
+        Args:
+            backend: LocalBackend, RedisBackend or any object with the same
+                get/set/counter/incr/size methods
+            enabled (bool): if False, `cached` routes always run the view
+        """
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = {}
+
+    def _key(self, group):
+        version = g.get("data_version", "")
+        return f"{group}:{self.backend.counter(f'generation:{group}')}:{version}:{request.full_path}"
+
+    def cached(self, group, ttl):
+        """Decorator for GET routes whose response depends only on the URL.
+
+        Args:
+            group (str): invalidation group of the route
+            ttl (int): seconds an entry stays valid without invalidation
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                key = self._key(group)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits[group] = self.hits.get(group, 0) + 1
+                    data, mimetype = entry
+                    response = Response(data, mimetype=mimetype)
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                self.misses[group] = self.misses.get(group, 0) + 1
+                response = make_response(view(*args, **kwargs))
+                # Streamed responses are not buffered, or their memory bound would be lost
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), response.mimetype), ttl)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *groups):
+        """Drops every cached response of the given groups."""
+        for group in groups:
+            self.backend.incr(f"generation:{group}")
+            self.invalidations[group] = self.invalidations.get(group, 0) + 1
+
+    def stats(self):
+        """Returns hit/miss/invalidation counters per group and the entry count."""
+        groups = set(self.hits) | set(self.misses) | set(self.invalidations)
+        return {
+            "enabled": self.enabled,
+            "entries": self.backend.size(),
+            "groups": {
+                group: {
+                    "hits":          self.hits.get(group, 0),
+                    "misses":        self.misses.get(group, 0),
+                    "invalidations": self.invalidations.get(group, 0)
+                }
+                for group in sorted(groups)
+            }
+        }
@@ -0,0 +1,90 @@
+import json
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """Listens to a PostgreSQL NOTIFY channel on a dedicated connection.
+
+    Runs in a daemon thread and passes every notification payload (decoded
+    from JSON) to the subscribed callbacks, together with the listening
+    connection so they can read the changed rows without going through the
+    API connection pool. Two extra payloads are sent by the listener itself:
+    `{"op": "RESET"}` once LISTEN is active on a new connection (subscribers
+    should reload their state, as changes may have been missed) and
+    `{"op": "LOST"}` with no connection when the connection drops.
+    """
+
+    def __init__(self, db_config, channel, timeout=5, retry_delay=5):
+        """
+        Args:
+            db_config (dict): psycopg2 connection arguments
+            channel (str): channel name passed to LISTEN
+            timeout (int): seconds to wait in select() between polls
+            retry_delay (int): seconds to wait before reconnecting
+        """
+        self.db_config = db_config
+        self.channel = channel
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self._subscribers = []
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def subscribe(self, callback):
+        """Registers a callback called as `callback(payload, conn)`."""
+        self._subscribers.append(callback)
+
+    def start(self):
+        """Starts the listener thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Asks the listener thread to exit after its current poll."""
+        self._stopped.set()
+
+    def _dispatch(self, payload, conn=None):
+        for callback in self._subscribers:
+            try:
+                callback(payload, conn)
+            except Exception as e:
+                logger.warning("%s subscriber error: %s", self.channel, e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel};")
+                self._dispatch({"op": "RESET"}, conn)
+
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], self.timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            payload = json.loads(notify.payload)
+                        except ValueError:
+                            continue
+                        self._dispatch(payload, conn)
+            except Exception as e:
+                logger.warning("%s listener error: %s", self.channel, e)
+                self._dispatch({"op": "LOST"})
+                time.sleep(self.retry_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
@@ -0,0 +1,81 @@
+import json
+import queue
+import threading
+
+
+class EventBroker:
+    """Fans out change notifications to Server-Sent Events clients.
+
+    `publish` is subscribed to the shared ChangeListener, so every client
+    gets the events of one database connection. Each client has a bounded
+    queue; a client that falls behind is sent a single `reset` event (it
+    should resync, e.g. with /changes) instead of blocking the listener.
+    """
+
+    def __init__(self, max_queue=256):
+        """
+        Args:
+            max_queue (int): events buffered per client before it is reset
+        """
+        self.max_queue = max_queue
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Registers a new client and returns its queue."""
+        client = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        """Removes a client queue (when its stream is closed)."""
+        with self._lock:
+            self._clients.discard(client)
+
+    def client_count(self):
+        return len(self._clients)
+
+    def publish(self, payload, conn=None):
+        """Queues a notification payload for every client.
+
+        RESET and LOST from the listener become a `reset` event, since
+        changes may have been missed while the connection was down.
+
+        Args:
+            payload (dict): notification payload with op, table and id
+            conn: the listener's connection (unused)
+        """
+        if payload.get("op") in ("RESET", "LOST"):
+            event = ("reset", {})
+        else:
+            event = (payload.get("table", "message"), payload)
+
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(event)
+            except queue.Full:
+                with client.mutex:
+                    client.queue.clear()
+                client.put_nowait(("reset", {}))
+
+    def stream(self, client, heartbeat=15):
+        """Yields SSE frames for one client until the connection is closed.
+
+        Args:
+            client (queue.Queue): queue returned by `subscribe`
+            heartbeat (int): seconds between keep-alive comments
+        """
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    name, data = client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(client)
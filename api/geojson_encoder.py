@@ -0,0 +1,94 @@
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Encodes values the JSON backends do not handle natively."""
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def dumps(obj):
+    """Serializes to compact JSON bytes, with orjson if it is installed.
+
+    Args:
+        obj: object to serialize
+
+    Returns:
+        bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def round_coordinates(coordinates, precision):
+    """Rounds a (nested) GeoJSON coordinates array to `precision` decimals."""
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(c, precision) for c in coordinates]
+    return [round_coordinates(c, precision) for c in coordinates]
+
+
+def feature(row, geometry_column="geom", properties=None, precision=None):
+    """Builds a GeoJSON Feature from a row.
+
+    Args:
+        row (dict): database row; its geometry is a GeoJSON dict or None
+        geometry_column (str): key holding the geometry
+        properties (tuple): optional whitelist of property keys, in order
+        precision (int): optional number of coordinate decimals
+
+    Returns:
+        dict
+    """
+    geometry = row.get(geometry_column)
+    if precision is not None and geometry and "coordinates" in geometry:
+        geometry = dict(geometry, coordinates=round_coordinates(geometry["coordinates"], precision))
+
+    if properties is None:
+        props = dict(row)
+        props.pop(geometry_column, None)
+    else:
+        props = {key: row[key] for key in properties}
+
+    return {"type": "Feature", "geometry": geometry, "properties": props}
+
+
+def feature_collection(rows, geometry_column="geom", properties=None, precision=None, meta=None):
+    """Builds a GeoJSON FeatureCollection, whatever the number of rows.
+
+    Args:
+        rows (list): database rows
+        geometry_column (str): key holding the geometry
+        properties (tuple): optional whitelist of property keys
+        precision (int): optional number of coordinate decimals
+        meta (dict): optional meta object added to the collection
+
+    Returns:
+        dict
+    """
+    collection = {
+        "type": "FeatureCollection",
+        "features": [feature(row, geometry_column, properties, precision) for row in rows]
+    }
+    if meta is not None:
+        collection["meta"] = meta
+    return collection
+
+
+def encode_feature_collection(rows, geometry_column="geom", properties=None, precision=None, meta=None):
+    """Builds and serializes a FeatureCollection in one call.
+
+    Args:
+        see `feature_collection`
+
+    Returns:
+        bytes
+    """
+    return dumps(feature_collection(rows, geometry_column, properties, precision, meta))
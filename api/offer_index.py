@@ -0,0 +1,283 @@
+import threading
+
+import numpy as np
+
+# Radius of the sphere used by EPSG:3857
+WEB_MERCATOR_RADIUS = 6378137.0
+
+# Mean Earth radius used for haversine distances
+EARTH_RADIUS_M = 6371008.8
+
+# Max number of need-offer distances computed per NumPy batch; coverage() of a
+# category with at most this many pairs skips the grid and computes them all
+COVERAGE_BATCH_CELLS = 1_000_000
+
+# Points with no offer within the largest radius are searched in blocks this
+# many times wider than the blocks used for counting
+FAR_BLOCK_FACTOR = 4
+
+# Safety margin between haversine and scaled Web Mercator distances
+MERCATOR_MARGIN = 1.01
+
+
+def mercator_to_radians(x, y):
+    """Converts EPSG:3857 coordinates to longitude/latitude in radians."""
+    return x / WEB_MERCATOR_RADIUS, np.arctan(np.sinh(y / WEB_MERCATOR_RADIUS))
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres between points given in radians."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _nearest_and_counts(lon, lat, offer_lon, offer_lat, limits):
+    """Distance to the nearest offer and offer counts within limits, for each point.
+
+    Distances are rounded to 0.1 m like the SQL path and computed in batches
+    of at most COVERAGE_BATCH_CELLS entries.
+
+    Returns:
+        tuple of the nearest distances (inf without offers) and an integer
+        array of shape (points, limits)
+    """
+    nearest = np.full(len(lon), np.inf)
+    counts = np.zeros((len(lon), len(limits)), dtype=int)
+    if not len(offer_lon):
+        return nearest, counts
+
+    batch = max(1, COVERAGE_BATCH_CELLS // len(offer_lon))
+    for start in range(0, len(lon), batch):
+        stop = start + batch
+        distances = np.round(haversine_m(lon[start:stop, None], lat[start:stop, None], offer_lon, offer_lat), 1)
+        nearest[start:stop] = distances.min(axis=1)
+        counts[start:stop] = (distances[:, :, None] <= limits).sum(axis=1)
+    return nearest, counts
+
+
+def _blocks(cells_x, cells_y, points, width):
+    """Groups points by square blocks of width x width grid cells.
+
+    Yields:
+        tuple of the block's first and last cell columns and rows
+        (x0, x1, y0, y1) and the array of its point positions
+    """
+    groups = {}
+    for i, key in zip(points, zip(cells_x[points] // width, cells_y[points] // width)):
+        groups.setdefault(key, []).append(i)
+    for (bx, by), members in groups.items():
+        yield (bx * width, bx * width + width - 1, by * width, by * width + width - 1), np.array(members)
+
+
+class _CategoryGrid:
+    """NumPy arrays and a uniform EPSG:3857 grid over the offers of one category."""
+
+    def __init__(self, rows, cell_size):
+        self.rows = rows
+        self.cell_size = cell_size
+        x = np.array([row["x"] for row in rows], dtype=float)
+        y = np.array([row["y"] for row in rows], dtype=float)
+        self.lon, self.lat = mercator_to_radians(x, y)
+
+        cells = np.stack([(x // cell_size).astype(int), (y // cell_size).astype(int)], axis=1)
+        keys, offer_cell = np.unique(cells, axis=0, return_inverse=True)
+        self.cell_x, self.cell_y = keys[:, 0], keys[:, 1]
+        self.offer_cell = offer_cell.reshape(-1)
+        order = np.argsort(self.offer_cell, kind="stable")
+        splits = np.split(order, np.flatnonzero(np.diff(self.offer_cell[order])) + 1)
+        self.cells = {(int(cx), int(cy)): members for cx, cy, members in zip(self.cell_x, self.cell_y, splits)}
+
+    def lower_bounds(self, block):
+        """Lower bound in metres of the ground distance between a block of cells and each occupied cell.
+
+        The Web Mercator gap between the two is scaled by the cosine of the
+        latitude edge nearest to a pole, the smallest scale along the way.
+
+        Args:
+            block (tuple): first and last cell columns and rows (x0, x1, y0, y1)
+        """
+        x0, x1, y0, y1 = block
+        gap_x = np.maximum(np.maximum(self.cell_x - x1, x0 - self.cell_x) - 1, 0) * self.cell_size
+        gap_y = np.maximum(np.maximum(self.cell_y - y1, y0 - self.cell_y) - 1, 0) * self.cell_size
+        edge = np.maximum(np.maximum(np.abs(self.cell_y), np.abs(self.cell_y + 1)), max(abs(y0), abs(y1 + 1)))
+        _, lat = mercator_to_radians(0.0, edge * float(self.cell_size))
+        return np.hypot(gap_x, gap_y) * np.cos(lat) / MERCATOR_MARGIN
+
+    def reach(self, block, ring):
+        """Ground distance in metres covered for any point of a block by the cells `ring` steps around it."""
+        _, _, y0, y1 = block
+        edge = max(abs(y0 - ring), abs(y1 + ring + 1)) * float(self.cell_size)
+        _, lat = mercator_to_radians(0.0, edge)
+        return ring * self.cell_size * np.cos(lat) / MERCATOR_MARGIN
+
+    def near(self, block, distance):
+        """Returns the positions of the offers that can lie within distance metres of a block of cells.
+
+        Reads the cells of the smallest ring around the block covering the
+        distance, or tests every occupied cell when the ring has more cells.
+        """
+        x0, x1, y0, y1 = block
+
+        def size(ring):
+            return (x1 - x0 + 1 + 2 * ring) * (y1 - y0 + 1 + 2 * ring)
+
+        ring = 1
+        while self.reach(block, ring) < distance and size(ring) <= len(self.cells):
+            ring += 1
+        if size(ring) > len(self.cells):
+            return self.members(self.lower_bounds(block) <= distance)
+        found = [
+            self.cells[(x, y)]
+            for x in range(x0 - ring, x1 + ring + 1)
+            for y in range(y0 - ring, y1 + ring + 1)
+            if (x, y) in self.cells
+        ]
+        return np.concatenate(found) if found else np.array([], dtype=int)
+
+    def members(self, cells):
+        """Returns the positions of the offers in the occupied cells selected by a boolean mask."""
+        return np.flatnonzero(cells[self.offer_cell])
+
+    def nearest_and_counts(self, lon, lat, limits, members=None):
+        if members is None:
+            return _nearest_and_counts(lon, lat, self.lon, self.lat, limits)
+        return _nearest_and_counts(lon, lat, self.lon[members], self.lat[members], limits)
+
+
+class OfferIndex:
+    """In-memory index of active offers, grouped by category.
+
+    Rows are dicts with at least offer_id, category_id, x and y (EPSG:3857).
+    The per-category grids are built lazily and dropped whenever an offer of
+    that category changes. Distances are haversine, which can differ from
+    PostGIS geography (spheroid) distances by up to about 0.5%.
+    """
+
+    def __init__(self, cell_size=2000):
+        """
+        Args:
+            cell_size (int): grid cell size in EPSG:3857 units
+        """
+        self.cell_size = cell_size
+        self.ready = False
+        self._lock = threading.Lock()
+        self._offers = {}
+        self._grids = {}
+
+    def load(self, rows):
+        """Replaces the whole index and marks it ready."""
+        with self._lock:
+            self._offers = {row["offer_id"]: row for row in rows}
+            self._grids = {}
+            self.ready = True
+
+    def invalidate(self):
+        """Marks the index stale so callers fall back to the database."""
+        self.ready = False
+
+    def upsert(self, row):
+        """Adds or replaces one offer."""
+        with self._lock:
+            previous = self._offers.get(row["offer_id"])
+            if previous:
+                self._grids.pop(previous["category_id"], None)
+            self._offers[row["offer_id"]] = row
+            self._grids.pop(row["category_id"], None)
+
+    def remove(self, offer_id):
+        """Removes one offer if it is in the index."""
+        with self._lock:
+            previous = self._offers.pop(offer_id, None)
+            if previous:
+                self._grids.pop(previous["category_id"], None)
+
+    def _grid(self, category_id):
+        with self._lock:
+            grid = self._grids.get(category_id)
+            if grid is None:
+                rows = [row for row in self._offers.values() if row["category_id"] == category_id]
+                grid = _CategoryGrid(rows, self.cell_size) if rows else False
+                self._grids[category_id] = grid
+            return grid
+
+    def nearby(self, category_id, x, y, radius):
+        """Returns every offer of a category ordered by distance to a point.
+
+        Args:
+            category_id (int): category of the offers
+            x (float): EPSG:3857 x of the point
+            y (float): EPSG:3857 y of the point
+            radius (int): radius in metres used for the `proximity` tag
+
+        Returns:
+            list of offer rows with added distance_m and proximity
+            ('nearby' or 'related')
+        """
+        grid = self._grid(category_id)
+        if not grid:
+            return []
+        lon, lat = mercator_to_radians(x, y)
+        distances = np.round(haversine_m(lon, lat, grid.lon, grid.lat), 1)
+        return [
+            dict(grid.rows[i], distance_m=float(distances[i]),
+                 proximity="nearby" if distances[i] <= radius else "related")
+            for i in np.argsort(distances, kind="stable")
+        ]
+
+    def coverage(self, category_id, x, y, radii):
+        """Computes offer coverage for many points of one category at once.
+
+        Small categories (at most COVERAGE_BATCH_CELLS point-offer pairs) are
+        computed as one distance matrix. Otherwise the points are grouped in
+        blocks of grid cells about as wide as the largest radius, and each
+        block is only compared with the offers of the cells that can lie
+        within that radius. Points with no offer there widen the search to the
+        cells that can beat the distance to the closest occupied cell.
+        Distances are rounded to 0.1 m like the SQL path.
+
+        Args:
+            category_id (int): category of the offers
+            x (sequence): EPSG:3857 x of the points
+            y (sequence): EPSG:3857 y of the points
+            radii (list): radii in metres to count offers within
+
+        Returns:
+            tuple of an array with the distance to the nearest offer per point
+            (NaN if the category has no offers) and an integer array of shape
+            (points, radii) with the number of offers within each radius
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        lon, lat = mercator_to_radians(x, y)
+        nearest = np.full(len(lon), np.nan)
+        counts = np.zeros((len(lon), len(radii)), dtype=int)
+
+        grid = self._grid(category_id)
+        if not grid or not len(lon):
+            return nearest, counts
+
+        limits = np.asarray(radii, dtype=float)
+        if len(lon) * len(grid.lon) <= COVERAGE_BATCH_CELLS:
+            nearest[:], counts[:] = grid.nearest_and_counts(lon, lat, limits)
+            return nearest, counts
+
+        # Rounded distances can sit up to 0.05 m below the true ones
+        slack = 0.1
+        # Points are grouped in square blocks of cells about as wide as the largest radius
+        width = max(1, int(limits.max() // self.cell_size))
+        cells_x, cells_y = (x // self.cell_size).astype(int), (y // self.cell_size).astype(int)
+
+        missing = []
+        for block, points in _blocks(cells_x, cells_y, np.arange(len(lon)), width):
+            members = grid.near(block, limits.max() + slack)
+            nearest[points], counts[points] = grid.nearest_and_counts(lon[points], lat[points], limits, members)
+            missing.append(points[nearest[points] > limits.max()])
+
+        # Points whose nearest offer is beyond the largest radius, in wider blocks: the closest
+        # occupied cell gives an upper bound, then every cell whose lower bound beats it is searched
+        for block, points in _blocks(cells_x, cells_y, np.concatenate(missing), width * FAR_BLOCK_FACTOR):
+            bounds = grid.lower_bounds(block)
+            upper, _ = grid.nearest_and_counts(lon[points], lat[points], limits[:0], grid.members(bounds == bounds.min()))
+            cells = bounds <= np.minimum(nearest[points], upper).max() + slack
+            nearest[points], _ = grid.nearest_and_counts(lon[points], lat[points], limits[:0], grid.members(cells))
+        return nearest, counts
@@ -1,17 +1,28 @@
 from pathlib import Path
 import sys
-from flask import Flask, json, redirect, request, jsonify, render_template, url_for, session
+from flask import Flask, Response, g, json, make_response, redirect, request, jsonify, render_template, url_for, session
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.extras import Json, RealDictCursor, register_default_json
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 try:
-    from api.utils import format_geojson
+    from api.cache import LocalBackend, RedisBackend, ResponseCache
+    from api.change_listener import ChangeListener
+    from api.events import EventBroker
+    from api.geojson_encoder import encode_feature_collection, feature_collection
+    from api.utils import stream_geojson_featurecollection
 except ImportError:
-    from utils import format_geojson
+    from cache import LocalBackend, RedisBackend, ResponseCache
+    from change_listener import ChangeListener
+    from events import EventBroker
+    from geojson_encoder import encode_feature_collection, feature_collection
+    from utils import stream_geojson_featurecollection
 import os
 import bcrypt
+import functools
+import hashlib
 import secrets
 import smtplib
+import threading
 import yaml
 from email.message import EmailMessage
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -59,9 +70,21 @@ DB_CONFIG = {
     "port":     db_cfg["port"]
 }
 
-db_pool = SimpleConnectionPool(
+# Max pooled connections per worker process (config `database.pool_max` or env DB_POOL_MAX).
+# Every request holds one while it runs (streamed responses until the client has read
+# them); /events streams hold none. See "Connection Pool" in the README for --threads
+DB_POOL_MAX = int(db_cfg.get("pool_max") or os.environ.get("DB_POOL_MAX", 20))
+
+# Seconds a request waits for a free connection before failing with PoolError
+DB_POOL_TIMEOUT = 10
+
+# ThreadedConnectionPool is thread-safe but raises at once when exhausted, so
+# requests queue on this semaphore first
+db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+db_pool = ThreadedConnectionPool(
     minconn=1,
-    maxconn=10,
+    maxconn=DB_POOL_MAX,
     database=DB_CONFIG["database"],
     user=DB_CONFIG["user"],
     password=DB_CONFIG["password"],
@@ -78,12 +101,21 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY", "change-this-in-production")
 
 
 def get_db_connection():
-    """Gets a connection from the pool.
+    """Gets a connection from the pool, waiting up to DB_POOL_TIMEOUT for a free one.
 
     Returns:
         psycopg2 connection with RealDictCursor factory
+
+    Raises:
+        PoolError: if no connection was released in time
     """
-    return db_pool.getconn()
+    if not db_pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise PoolError(f"no free database connection after {DB_POOL_TIMEOUT}s")
+    try:
+        return db_pool.getconn()
+    except Exception:
+        db_pool_slots.release()
+        raise
 
 
 def release_db_connection(conn):
@@ -93,6 +125,518 @@ def release_db_connection(conn):
         conn: psycopg2 connection to release
     """
     db_pool.putconn(conn)
+    db_pool_slots.release()
+
+
+# Upper bound for the `limit` query param on paginated map endpoints
+MAX_PAGE_SIZE = 5000
+
+
+def parse_bbox(value):
+    """Parses a `minx,miny,maxx,maxy` bounding box given in EPSG:4326.
+
+    Args:
+        value (str): raw query string value, may be None or empty
+
+    Returns:
+        tuple of four floats (minx, miny, maxx, maxy), or None if not given
+
+    Raises:
+        ValueError: if the value is not four numbers or the box is inverted
+    """
+    if not value:
+        return None
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be 'minx,miny,maxx,maxy'")
+    if minx >= maxx or miny >= maxy:
+        raise ValueError("bbox min values must be lower than max values")
+    return minx, miny, maxx, maxy
+
+
+def bbox_filter(alias):
+    """Returns the SQL that keeps rows whose `geom` intersects the request bbox.
+
+    The envelope is transformed once to EPSG:3857 so the `&&` test runs
+    directly against the GIST index on `geom`.
+
+    Args:
+        alias (str): table alias used in the query (e.g. 'n')
+
+    Returns:
+        str: SQL fragment to append to a WHERE, using the `bbox_sql_params` keys
+    """
+    return f"AND {alias}.geom && ST_Transform(ST_MakeEnvelope(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, 4326), 3857)"
+
+
+def bbox_sql_params(bbox):
+    """Maps a parsed bbox to the named parameters used by `bbox_filter`.
+
+    Args:
+        bbox (tuple): (minx, miny, maxx, maxy) as returned by `parse_bbox`
+
+    Returns:
+        dict of query parameters
+    """
+    return dict(zip(("minx", "miny", "maxx", "maxy"), bbox))
+
+
+def viewport_params(alias, id_column):
+    """Builds the bbox and keyset pagination SQL for a map collection endpoint.
+
+    Pagination is keyset based on the primary key: the `cursor` is the last
+    ID of the previous page.
+
+    Query params:
+        bbox (str): optional `minx,miny,maxx,maxy` in EPSG:4326
+        limit (int): optional page size (capped at MAX_PAGE_SIZE)
+        cursor (int): optional ID after which the page starts
+
+    Args:
+        alias (str): table alias used in the query (e.g. 'n')
+        id_column (str): primary key column of the table (e.g. 'need_id')
+
+    Returns:
+        dict with `filter` (SQL to append to a WHERE), `order` (ORDER BY/LIMIT
+        SQL), `params` (query parameters), `limit` and `paginated` flag
+
+    Raises:
+        ValueError: if bbox or limit are invalid
+    """
+    bbox = parse_bbox(request.args.get("bbox"))
+    limit = request.args.get("limit", None, type=int)
+    cursor_id = request.args.get("cursor", None, type=int)
+
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be a positive integer")
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    filters = []
+    params = {}
+    if bbox:
+        filters.append(bbox_filter(alias))
+        params.update(bbox_sql_params(bbox))
+    if cursor_id is not None:
+        filters.append(f"AND {alias}.{id_column} > %(cursor)s")
+        params["cursor"] = cursor_id
+
+    order = f"ORDER BY {alias}.{id_column}"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        order += " LIMIT %(limit_plus_one)s"
+        params["limit_plus_one"] = limit + 1
+
+    return {
+        "filter":    "\n".join(filters),
+        "order":     order,
+        "params":    params,
+        "bbox":      bbox,
+        "limit":     limit,
+        "paginated": bool(bbox or limit is not None or cursor_id is not None)
+    }
+
+
+def viewport_response(rows, viewport, id_column):
+    """Encodes the rows of a viewport query as a GeoJSON FeatureCollection response.
+
+    Paginated requests also get a `meta` object with the `next_cursor`.
+
+    Args:
+        rows (list): rows fetched with the `viewport_params` SQL
+        viewport (dict): the result of `viewport_params`
+        id_column (str): primary key column used as cursor
+
+    Returns:
+        Flask Response with the JSON produced by `encode_feature_collection`
+    """
+    meta = None
+    if viewport["paginated"]:
+        limit = viewport["limit"]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][id_column]
+        meta = {
+            "bbox":        viewport["bbox"],
+            "limit":       limit,
+            "count":       len(rows),
+            "next_cursor": next_cursor
+        }
+
+    return Response(encode_feature_collection(rows, meta=meta), mimetype="application/json")
+
+
+def viewport_stream_meta(viewport):
+    """Returns the meta object of a streamed viewport response (no page size).
+
+    Args:
+        viewport (dict): the result of `viewport_params`
+
+    Returns:
+        dict completed with the count by the stream, or None if unpaginated
+    """
+    if not viewport["paginated"]:
+        return None
+    return {"bbox": viewport["bbox"], "limit": None, "next_cursor": None}
+
+
+def geojson_featurecollection_sql(query, geometry_column="geom"):
+    """Wraps a row query so PostgreSQL returns the whole FeatureCollection as text.
+
+    The features are built with json_build_object/json_agg around the
+    `ST_AsGeoJSON(...)::json` geometry, and every other column becomes a
+    property. The `::text` result is sent to the client untouched, so
+    psycopg2 does not decode it and Flask does not re-encode it.
+
+    Args:
+        query (str): SQL returning one row per feature (ORDER BY is kept)
+        geometry_column (str): json column holding the GeoJSON geometry
+
+    Returns:
+        str: SQL returning one `collection` text column
+    """
+    return f"""
+        SELECT json_build_object(
+            'type', 'FeatureCollection',
+            'features', COALESCE(json_agg(json_build_object(
+                'type', 'Feature',
+                'geometry', rows.{geometry_column},
+                'properties', to_jsonb(rows) - '{geometry_column}'
+            )), '[]'::json)
+        )::text AS collection
+        FROM ({query}) rows
+    """
+
+
+def json_rows_sql(query):
+    """Wraps a row query so PostgreSQL returns its rows as one JSON array text.
+
+    Args:
+        query (str): SQL returning the rows (ORDER BY is kept)
+
+    Returns:
+        str: SQL returning one `rows_json` text column
+    """
+    return f"SELECT COALESCE(json_agg(rows), '[]'::json)::text AS rows_json FROM ({query}) rows"
+
+
+# Rows fetched per round trip by streamed GeoJSON responses
+STREAM_BATCH_SIZE = 2000
+
+
+def stream_geojson_response(query, params=None, meta=None):
+    """Streams the rows of a query as a GeoJSON FeatureCollection.
+
+    The query runs on a server-side (named) cursor and is read in
+    STREAM_BATCH_SIZE batches, so memory stays flat whatever the row count
+    and the first bytes are sent before the last rows are read. json
+    columns (the `ST_AsGeoJSON(...)::json` geometry) are kept as text and
+    written verbatim instead of being parsed and re-serialized. The pooled
+    connection is held until the response is closed: the cleanup is
+    registered with `call_on_close`, which also runs for HEAD requests,
+    where the generator is never started.
+
+    Args:
+        query (str): SQL returning a `geom` column with GeoJSON
+        params (dict): query parameters
+        meta (dict): optional meta object, written after the features with
+            their count
+
+    Returns:
+        streamed Flask Response
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(name=f"stream_{secrets.token_hex(4)}", cursor_factory=psycopg2.extensions.cursor)
+        register_default_json(cursor, loads=lambda value: value)
+        cursor.execute(query, params)
+    except Exception:
+        conn.rollback()
+        release_db_connection(conn)
+        raise
+
+    def close():
+        try:
+            cursor.close()
+            conn.rollback()
+        finally:
+            release_db_connection(conn)
+
+    response = Response(
+        stream_geojson_featurecollection(cursor, batch_size=STREAM_BATCH_SIZE, meta=meta),
+        mimetype="application/json"
+    )
+    response.call_on_close(close)
+    return response
+
+
+# ─── CHANGE LISTENER ──────────────────────────────────────────────────────────
+
+# One listener on the `map_changes` channel, shared by the offer index, the
+# response cache and the /events stream; it is started after all have subscribed
+change_listener = ChangeListener(DB_CONFIG, "map_changes")
+
+
+# ─── OFFER INDEX ──────────────────────────────────────────────────────────────
+
+# Optional in-memory index of active offers (config `api.offer_index` or env OFFER_INDEX=1)
+OFFER_INDEX_ENABLED = bool(config.get("api", {}).get("offer_index", os.environ.get("OFFER_INDEX") == "1"))
+
+OFFER_INDEX_QUERY = """
+    SELECT
+        o.offer_id,
+        o.category AS category_id,
+        o.title,
+        o.descrip,
+        o.address_point,
+        c.name_cat AS category,
+        ST_AsGeoJSON(o.geom)::json AS geom,
+        ST_X(o.geom) AS x,
+        ST_Y(o.geom) AS y
+    FROM offer o
+    JOIN category c ON o.category = c.category_id
+    WHERE o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
+"""
+
+offer_index = None
+
+
+def refresh_offer_index(payload, conn):
+    """Applies a `map_changes` notification to the in-memory offer index.
+
+    Called from the ChangeListener thread with its own connection, so the
+    API pool is not touched. RESET reloads every active offer, LOST marks
+    the index stale and offer changes re-read that single row (which drops
+    it from the index if it is no longer active).
+
+    Args:
+        payload (dict): notification payload with op, table and id
+        conn: the listener's psycopg2 connection, None on LOST
+    """
+    if payload.get("op") == "LOST":
+        offer_index.invalidate()
+        return
+
+    if payload.get("op") == "RESET":
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(OFFER_INDEX_QUERY)
+            offer_index.load(cursor.fetchall())
+        return
+
+    if payload.get("table") != "offer":
+        return
+
+    if payload["op"] == "DELETE":
+        offer_index.remove(payload["id"])
+        return
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(OFFER_INDEX_QUERY + " AND o.offer_id = %s", (payload["id"],))
+        row = cursor.fetchone()
+    if row:
+        offer_index.upsert(row)
+    else:
+        offer_index.remove(payload["id"])
+
+
+if OFFER_INDEX_ENABLED:
+    try:
+        from api.offer_index import OfferIndex
+    except ImportError:
+        from offer_index import OfferIndex
+
+    offer_index = OfferIndex()
+    change_listener.subscribe(refresh_offer_index)
+
+
+def offer_index_ready():
+    """Tells whether proximity queries can be answered from the offer index."""
+    return offer_index is not None and offer_index.ready
+
+
+# ─── RESPONSE CACHE ───────────────────────────────────────────────────────────
+
+cache_cfg = config.get("cache", {})
+
+# Cache GET responses of reference and map endpoints (config `cache.enabled` or env CACHE_ENABLED)
+CACHE_ENABLED = bool(cache_cfg.get("enabled", os.environ.get("CACHE_ENABLED", "1") == "1"))
+
+# Reference data only changes when the ETL runs
+REFERENCE_CACHE_TTL = 3600
+
+# Needs and offers change often; invalidation keeps them fresh, the TTL bounds staleness
+MAP_CACHE_TTL = 30
+
+# Endpoints whose successful requests change needs, offers or assignments
+MAP_WRITE_ENDPOINTS = {
+    "create_need", "update_need", "delete_need",
+    "create_offer", "update_offer",
+    "create_assignment", "complete_assignment", "run_matching",
+    "delete_account"
+}
+
+cache_redis_url = cache_cfg.get("redis_url", os.environ.get("CACHE_REDIS_URL"))
+if cache_redis_url:
+    cache_backend = RedisBackend(cache_redis_url)
+else:
+    cache_backend = LocalBackend(max_entries=cache_cfg.get("max_entries", 1024))
+
+response_cache = ResponseCache(cache_backend, enabled=CACHE_ENABLED)
+
+
+def invalidate_response_cache(payload, conn):
+    """Applies a `map_changes` notification to the response cache.
+
+    Need, offer and assignment changes (from any process) drop the 'map' group. A new
+    etl_load row drops both groups. RESET and LOST drop both as well,
+    because notifications may have been missed.
+
+    Args:
+        payload (dict): notification payload with op, table and id
+        conn: the listener's psycopg2 connection (unused)
+    """
+    if payload.get("op") in ("RESET", "LOST") or payload.get("table") == "etl_load":
+        response_cache.invalidate("reference", "map")
+    elif payload.get("table") in ("need", "offer", "assignments"):
+        response_cache.invalidate("map")
+
+
+@app.after_request
+def invalidate_cache_after_write(response):
+    """Drops the cached map responses right after a successful write in this process."""
+    if request.endpoint in MAP_WRITE_ENDPOINTS and response.status_code < 400:
+        response_cache.invalidate("map")
+    return response
+
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Returns the response cache hit/miss/invalidation counters of this process.
+
+    Returns:
+        JSON with enabled, entries and counters per cache group
+    """
+    return jsonify(response_cache.stats())
+
+
+if CACHE_ENABLED:
+    change_listener.subscribe(invalidate_response_cache)
+
+
+# ─── EVENTS ───────────────────────────────────────────────────────────────────
+
+event_broker = EventBroker()
+change_listener.subscribe(event_broker.publish)
+change_listener.start()
+
+
+@app.route('/events', methods=['GET'])
+def get_events():
+    """Streams need, offer and assignment changes as Server-Sent Events.
+
+    All clients share the single `map_changes` listener connection through
+    the EventBroker; no database connection is held per client. Each event
+    is named after the changed table (`need`, `offer`, `assignments`) with
+    data `{"table", "op", "id"}`. A `reset` event means changes may have
+    been missed and the client should resync (e.g. with /changes).
+
+    Returns:
+        text/event-stream response
+    """
+    client = event_broker.subscribe()
+    response = Response(event_broker.stream(client), mimetype="text/event-stream")
+    # HEAD responses never start the stream, so its own cleanup would not run
+    response.call_on_close(lambda: event_broker.unsubscribe(client))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ─── CONDITIONAL REQUESTS ─────────────────────────────────────────────────────
+
+# Version of need/offer: the latest writing transaction of the rows and tombstones,
+# plus the older transactions still running, whose commit can make rows with a
+# lower xact_id visible without changing the latest one (see running_xacts_before)
+ROW_VERSION_SQL = """
+    SELECT GREATEST((SELECT MAX(updated_at) FROM {table}),
+                    (SELECT MAX(deleted_at) FROM tombstone WHERE table_name = '{table}')) AS modified,
+           concat_ws('/', x.latest, running_xacts_before(x.latest)) AS version
+    FROM (
+        SELECT GREATEST(
+            (SELECT xact_id FROM {table} ORDER BY xact_id DESC LIMIT 1),
+            (SELECT xact_id FROM tombstone WHERE table_name = '{table}' ORDER BY xact_id DESC LIMIT 1)
+        ) AS latest
+    ) x
+"""
+
+# Change markers per data source; ETL-loaded tables use the latest etl_load row
+DATA_VERSION_SQL = {
+    "need":  ROW_VERSION_SQL.format(table="need"),
+    "offer": ROW_VERSION_SQL.format(table="offer"),
+    "etl": "SELECT MAX(finished_at) AS modified, MAX(etl_load_id)::text AS version FROM etl_load"
+}
+
+
+def data_versions(sources):
+    """Reads the change markers of the given data sources in one query.
+
+    Args:
+        sources (tuple): keys of DATA_VERSION_SQL
+
+    Returns:
+        tuple of (version string, latest modification datetime or None)
+    """
+    query = " UNION ALL ".join(f"({DATA_VERSION_SQL[source]})" for source in sources)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    version = "|".join(f"{row['modified'].isoformat() if row['modified'] else ''}/{row['version']}" for row in rows)
+    modified = max((row["modified"] for row in rows if row["modified"]), default=None)
+    return version, modified
+
+
+def conditional(*sources):
+    """Decorator adding ETag/Last-Modified validators to a GET route.
+
+    The validators are computed from `data_versions` before the view runs,
+    so a client whose copy is current gets `304 Not Modified` (from
+    If-None-Match) without the route querying or serializing anything. The ETag also covers the query
+    string, as it changes the response body. The version is also left in
+    `g.data_version` for the response cache key, so a cached body is only
+    served with the ETag of the data it was built from.
+
+    Args:
+        sources (str): keys of DATA_VERSION_SQL the route's data depends on
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version, modified = data_versions(sources)
+            etag = hashlib.md5(f"{request.full_path}#{version}".encode()).hexdigest()
+            g.data_version = hashlib.md5(version.encode()).hexdigest()
+
+            # If-Modified-Since is not honoured: updated_at is the start time of a
+            # transaction, which can commit after a later one and keep an older date
+            not_modified = bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+            response = Response(status=304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                if modified:
+                    response.last_modified = modified
+                response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
 
 
 # ─── USERS ────────────────────────────────────────────────────────────────────
@@ -440,6 +984,7 @@ def logout():
 # ─── CATEGORIES ───────────────────────────────────────────────────────────────
 
 @app.route('/categories', methods=['GET'])
+@response_cache.cached("reference", REFERENCE_CACHE_TTL)
 def get_categories():
     """Returns all available need/offer categories.
 
@@ -545,40 +1090,73 @@ def update_need(need_id):
     release_db_connection(conn)
     return {"success": True}
 
+# Columns and joins of the needs map layer, shared by /needs and /clusters
+NEED_JOINS = """
+    FROM need n
+    JOIN status_domain s ON n.status_id = s.status_id
+    JOIN urgency_domain u ON n.urgency = u.urgency_id
+    JOIN category c ON n.category = c.category_id
+    LEFT JOIN assignments a ON a.need_id = n.need_id
+        AND a.status_ass IN ('proposed', 'accepted')
+"""
+
+NEEDS_QUERY = """
+    SELECT n.need_id,
+        n.title,
+        n.descrip,
+        n.address_point,
+        n.user_id,
+        s.code as status,
+        u.code as urgency,
+        c.name_cat as category,
+        ST_AsGeoJSON(n.geom)::json as geom,
+        a.status_ass as assignment_status
+""" + NEED_JOINS
+
+
 @app.route('/needs', methods=['GET'])
+@conditional("need")
+@response_cache.cached("map", MAP_CACHE_TTL)
 def get_needs():
-    """Returns all needs as a GeoJSON FeatureCollection.
+    """Returns needs as a GeoJSON FeatureCollection, optionally bounded to a viewport.
+
+    Query params:
+        bbox (str): optional `minx,miny,maxx,maxy` in EPSG:4326
+        limit (int): optional page size (max MAX_PAGE_SIZE)
+        cursor (int): optional need_id to continue after (from meta.next_cursor)
 
     Returns:
-        GeoJSON FeatureCollection with need properties and point geometry
+        GeoJSON FeatureCollection with need properties and point geometry,
+        streamed when no limit is given. Paginated requests also include
+        meta.next_cursor (null on the last page)
     """
+    try:
+        viewport = viewport_params("n", "need_id")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Without a page size the whole (bbox) collection is streamed
+    if viewport["limit"] is None:
+        return stream_geojson_response(f"""
+            {NEEDS_QUERY}
+            WHERE 1=1 {viewport["filter"]}
+            {viewport["order"]}
+        """, viewport["params"], viewport_stream_meta(viewport))
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT n.need_id,
-                n.title,
-                n.descrip,
-                n.address_point,
-                n.user_id,
-                s.code as status,
-                u.code as urgency,
-                c.name_cat as category,
-                ST_AsGeoJSON(n.geom)::json as geom,
-                a.status_ass as assignment_status
-            FROM need n
-            JOIN status_domain s ON n.status_id = s.status_id
-            JOIN urgency_domain u ON n.urgency = u.urgency_id
-            JOIN category c ON n.category = c.category_id
-            LEFT JOIN assignments a ON a.need_id = n.need_id
-                AND a.status_ass IN ('proposed', 'accepted')
-        """)
+        cursor.execute(f"""
+            {NEEDS_QUERY}
+            WHERE 1=1 {viewport["filter"]}
+            {viewport["order"]}
+        """, viewport["params"])
         needs = cursor.fetchall()
     finally:
         cursor.close()
         release_db_connection(conn)
 
-    return jsonify(format_geojson(needs))
+    return viewport_response(needs, viewport, "need_id")
 
 
 @app.route('/needs', methods=['POST'])
@@ -656,27 +1234,79 @@ def create_need_page():
     return render_template("create_need.html")
 
 
+# Radii (m) reported by /needs/uncovered when `radii` is not given
+COVERAGE_DEFAULT_RADII = [1000, 2000, 5000]
+
+# Limits for the `radius`/`radii` query params of /needs/uncovered
+COVERAGE_MAX_RADII = 5
+COVERAGE_MAX_RADIUS = 50000
+
+
 @app.route('/needs/uncovered', methods=['GET'])
+@response_cache.cached("map", MAP_CACHE_TTL)
 def get_uncovered_needs():
     """Returns active needs that have no matching active offer within a given radius.
 
     A need is considered uncovered if there is no active offer sharing its
     category within the search radius. Ordered by urgency (critical first).
+    Coverage is computed for all active needs in one pass: the distance to
+    the nearest same-category offer and the number of offers within each
+    of the requested radii. When the in-memory offer index is ready this is
+    a batched NumPy computation, otherwise one query with LATERAL KNN joins.
 
     Query params:
         radius (int): search radius in metres (default: 2000)
+        radii (str): comma separated radii in metres to report coverage for
+            (default: 1000,2000,5000; `radius` is always included)
 
     Returns:
-        GeoJSON FeatureCollection of uncovered needs with urgency and category,
-        plus meta counts for critical and high urgency items
+        GeoJSON FeatureCollection of uncovered needs with urgency, category,
+        nearest_offer_m and offers_within per radius, plus meta counts for
+        critical and high urgency items and the uncovered count per radius
     """
     radius = request.args.get('radius', 2000, type=int)
+    try:
+        radii = [int(r) for r in request.args['radii'].split(",")] if request.args.get('radii') else list(COVERAGE_DEFAULT_RADII)
+    except ValueError:
+        return jsonify({"error": "radii must be a comma separated list of integers"}), 400
+    radii = sorted(set(radii) | {radius})
+    if len(radii) > COVERAGE_MAX_RADII + 1 or not all(0 < r <= COVERAGE_MAX_RADIUS for r in radii):
+        return jsonify({"error": f"Up to {COVERAGE_MAX_RADII} radii between 1 and {COVERAGE_MAX_RADIUS} m are allowed"}), 400
+
+    use_index = offer_index_ready()
+
+    # Without the offer index, coverage is computed in SQL
+    coverage_sql = "" if use_index else """
+                nearest.distance_m AS nearest_offer_m,
+                ARRAY(
+                    SELECT COUNT(d) FILTER (WHERE d <= r)
+                    FROM unnest(%(radii)s::integer[]) WITH ORDINALITY AS t(r, i)
+                    LEFT JOIN unnest(near.distances) AS d ON TRUE
+                    GROUP BY i
+                    ORDER BY i
+                ) AS offers_within,"""
+    coverage_joins = "" if use_index else """
+            LEFT JOIN LATERAL (
+                SELECT ROUND(ST_Distance(o.geog, n.geog)::numeric, 1) AS distance_m
+                FROM offer o
+                WHERE o.category  = n.category
+                  AND o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
+                ORDER BY o.geog <-> n.geog
+                LIMIT 1
+            ) nearest ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT array_agg(ROUND(ST_Distance(o.geog, n.geog)::numeric, 1)) AS distances
+                FROM offer o
+                WHERE o.category  = n.category
+                  AND o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
+                  AND ST_DWithin(o.geog, n.geog, %(max_radius)s)
+            ) near ON TRUE"""
 
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT
                 n.need_id,
                 n.user_id,
@@ -686,19 +1316,16 @@ def get_uncovered_needs():
                 c.name_cat  AS category,
                 u.code      AS urgency,
                 u.urgency_id,
+                n.category  AS category_id,
+                ST_X(n.geom) AS x,
+                ST_Y(n.geom) AS y,{coverage_sql}
                 ST_AsGeoJSON(n.geom)::json AS geom
             FROM need n
             JOIN category c       ON n.category  = c.category_id
-            JOIN urgency_domain u ON n.urgency    = u.urgency_id
+            JOIN urgency_domain u ON n.urgency    = u.urgency_id{coverage_joins}
             WHERE n.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
-              AND NOT EXISTS (
-                SELECT 1
-                FROM offer o
-                WHERE o.category  = n.category
-                  AND o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
-                  AND ST_DWithin(ST_Transform(o.geom, 4326)::geography, ST_Transform(n.geom, 4326)::geography, %(radius)s)              )
             ORDER BY u.urgency_id ASC
-        """, {"radius": radius})
+        """, {"radii": radii, "max_radius": radii[-1]})
 
         rows = cursor.fetchall()
 
@@ -708,20 +1335,42 @@ def get_uncovered_needs():
         cursor.close()
         release_db_connection(conn)
 
+    if use_index:
+        by_category = {}
+        for row in rows:
+            by_category.setdefault(row["category_id"], []).append(row)
+        for category_id, members in by_category.items():
+            nearest, counts = offer_index.coverage(
+                category_id, [row["x"] for row in members], [row["y"] for row in members], radii
+            )
+            for row, distance, row_counts in zip(members, nearest, counts):
+                row["nearest_offer_m"] = None if distance != distance else round(float(distance), 1)
+                row["offers_within"] = row_counts.tolist()
+
+    for row in rows:
+        if row["nearest_offer_m"] is not None:
+            row["nearest_offer_m"] = float(row["nearest_offer_m"])
+
+    def is_uncovered(row, r):
+        return row["nearest_offer_m"] is None or row["nearest_offer_m"] > r
+
     features = [
         {
             "type": "Feature",
             "geometry": row["geom"],
             "properties": {
-                "need_id":       row["need_id"],
-                "title":         row["title"],
-                "descrip":       row["descrip"],
-                "address_point": row["address_point"],
-                "category":      row["category"],
-                "urgency":       row["urgency"]
+                "need_id":         row["need_id"],
+                "title":           row["title"],
+                "descrip":         row["descrip"],
+                "address_point":   row["address_point"],
+                "category":        row["category"],
+                "urgency":         row["urgency"],
+                "nearest_offer_m": row["nearest_offer_m"],
+                "offers_within":   {str(r): count for r, count in zip(radii, row["offers_within"])}
             }
         }
         for row in rows
+        if is_uncovered(row, radius)
     ]
 
     return jsonify({
@@ -731,7 +1380,9 @@ def get_uncovered_needs():
             "radius_m":        radius,
             "total_uncovered": len(features),
             "critical_count":  sum(1 for f in features if f["properties"]["urgency"] == "critical"),
-            "high_count":      sum(1 for f in features if f["properties"]["urgency"] == "high")
+            "high_count":      sum(1 for f in features if f["properties"]["urgency"] == "high"),
+            "total_active":    len(rows),
+            "uncovered_by_radius": {str(r): sum(1 for row in rows if is_uncovered(row, r)) for r in radii}
         }
     })
 
@@ -743,6 +1394,7 @@ def get_nearby_offers(need_id):
     Fetches all active offers sharing the same category as the given need.
     Each offer is tagged as 'nearby' if within the specified radius, or
     'related' if outside it. Results are ordered by distance ascending.
+    Offers are read from the in-memory offer index when it is ready.
 
     Args:
         need_id (int): the ID of the need (from URL)
@@ -766,32 +1418,39 @@ def get_nearby_offers(need_id):
             return jsonify({"error": f"Need {need_id} not found"}), 404
 
         # Fetch need geometry separately so it's always available even with no offers
-        cursor.execute("SELECT ST_AsGeoJSON(geom)::json AS geom FROM need WHERE need_id = %s", (need_id,))
-        need_geom = cursor.fetchone()["geom"]
-
         cursor.execute("""
-            SELECT
-                o.offer_id,
-                o.title,
-                o.descrip,
-                o.address_point,
-                c.name_cat AS category,
-                ST_AsGeoJSON(o.geom)::json AS geom,
-                ROUND(ST_Distance(ST_Transform(o.geom, 4326)::geography, ST_Transform(n.geom, 4326)::geography)::numeric, 1) AS distance_m,
-                CASE
-                    WHEN ST_DWithin(ST_Transform(o.geom, 4326)::geography, ST_Transform(n.geom, 4326)::geography, %(radius)s) THEN 'nearby'
-                    ELSE 'related'
-                END AS proximity,
-                ST_AsGeoJSON(n.geom)::json AS need_geom
-            FROM offer o
-            JOIN need n ON n.need_id = %(need_id)s
-            JOIN category c ON o.category = c.category_id
-            WHERE o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
-              AND o.category = n.category
-            ORDER BY distance_m ASC
-        """, {"need_id": need_id, "radius": radius})
+            SELECT ST_AsGeoJSON(geom)::json AS geom, category, ST_X(geom) AS x, ST_Y(geom) AS y
+            FROM need WHERE need_id = %s
+        """, (need_id,))
+        need = cursor.fetchone()
+        need_geom = need["geom"]
 
-        rows = cursor.fetchall()
+        if offer_index_ready():
+            rows = offer_index.nearby(need["category"], need["x"], need["y"], radius)
+        else:
+            cursor.execute("""
+                SELECT
+                    o.offer_id,
+                    o.title,
+                    o.descrip,
+                    o.address_point,
+                    c.name_cat AS category,
+                    ST_AsGeoJSON(o.geom)::json AS geom,
+                    ROUND(ST_Distance(o.geog, n.geog)::numeric, 1) AS distance_m,
+                    CASE
+                        WHEN ST_DWithin(o.geog, n.geog, %(radius)s) THEN 'nearby'
+                        ELSE 'related'
+                    END AS proximity,
+                    ST_AsGeoJSON(n.geom)::json AS need_geom
+                FROM offer o
+                JOIN need n ON n.need_id = %(need_id)s
+                JOIN category c ON o.category = c.category_id
+                WHERE o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
+                  AND o.category = n.category
+                ORDER BY distance_m ASC
+                """, {"need_id": need_id, "radius": radius})
+
+            rows = cursor.fetchall()
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -828,6 +1487,34 @@ def get_nearby_offers(need_id):
     })
 
 
+# Facility types relevant to each need category (by category name)
+CATEGORY_FACILITY_MAP = {
+    'medical':       ['hospitals', 'clinics', 'pharmacies'],
+    'shelter':       ['schools', 'universities', 'community_centres', 'sports_centres'],
+    'food':          ['community_centres'],
+    'transport':     ['hospitals', 'clinics'],
+    'eldercare':     ['hospitals', 'clinics', 'pharmacies'],
+    'mental_health': ['hospitals', 'clinics', 'community_centres'],
+    'childcare':     ['schools', 'community_centres', 'sports_centres'],
+    'safety':        ['police', 'fire_stations'],
+    'hygiene':       ['pharmacies', 'community_centres'],
+    'clothing':      ['community_centres'],
+    'repairs':       ['community_centres'],
+    'education':     ['schools', 'universities'],
+    'tech':          ['community_centres', 'universities'],
+    'legal':         ['community_centres'],
+    'logistics':     ['community_centres'],
+    'translation':   ['community_centres'],
+    'social':        ['community_centres'],
+    'donation':      ['community_centres'],
+    'pets':          ['community_centres'],
+    'other':         ['community_centres'],
+}
+
+# How many KNN candidates (per requested result) are re-ranked by geodesic distance
+KNN_CANDIDATE_FACTOR = 4
+
+
 @app.route('/needs/<int:need_id>/nearest-facilities', methods=['GET'])
 def get_nearest_facilities(need_id):
     """Returns the nearest facilities to a given need, filtered by need category.
@@ -847,29 +1534,6 @@ def get_nearest_facilities(need_id):
     limit = request.args.get('limit', 5, type=int)
     need_category = request.args.get('need_category', None)
 
-    CATEGORY_FACILITY_MAP = {
-        'medical':       ['hospitals', 'clinics', 'pharmacies'],
-        'shelter':       ['schools', 'universities', 'community_centres', 'sports_centres'],
-        'food':          ['community_centres'],
-        'transport':     ['hospitals', 'clinics'],
-        'eldercare':     ['hospitals', 'clinics', 'pharmacies'],
-        'mental_health': ['hospitals', 'clinics', 'community_centres'],
-        'childcare':     ['schools', 'community_centres', 'sports_centres'],
-        'safety':        ['police', 'fire_stations'],
-        'hygiene':       ['pharmacies', 'community_centres'],
-        'clothing':      ['community_centres'],
-        'repairs':       ['community_centres'],
-        'education':     ['schools', 'universities'],
-        'tech':          ['community_centres', 'universities'],
-        'legal':         ['community_centres'],
-        'logistics':     ['community_centres'],
-        'translation':   ['community_centres'],
-        'social':        ['community_centres'],
-        'donation':      ['community_centres'],
-        'pets':          ['community_centres'],
-        'other':         ['community_centres'],
-    }
-
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -879,35 +1543,154 @@ def get_nearest_facilities(need_id):
             return jsonify({"error": f"Need {need_id} not found"}), 404
 
         if need_category and need_category in CATEGORY_FACILITY_MAP:
-            relevant_types = tuple(CATEGORY_FACILITY_MAP[need_category])
-            cursor.execute("""
-                SELECT
-                    f.facility_id,
-                    f.name_fac,
-                    f.facility_type,
-                    ST_AsGeoJSON(f.geom)::json AS geom,
-                    ROUND(ST_Distance(ST_Transform(f.geom, 4326)::geography, ST_Transform(n.geom, 4326)::geography)::numeric, 1) AS distance_m
-                FROM facility f
-                JOIN need n ON n.need_id = %(need_id)s
-                WHERE f.facility_type IN %(relevant_types)s
-                ORDER BY distance_m ASC
-                LIMIT %(limit)s
-            """, {"need_id": need_id, "relevant_types": relevant_types, "limit": limit})
+            type_filter = "WHERE f.facility_type IN %(relevant_types)s"
+        elif facility_type:
+            type_filter = "WHERE f.facility_type = %(facility_type)s"
         else:
-            type_filter = "AND f.facility_type = %(facility_type)s" if facility_type else ""
-            cursor.execute(f"""
+            type_filter = ""
+
+        # KNN: the GIST index on geom yields facilities in planar (3857) distance
+        # order, so only a small candidate set is read. Mercator distortion barely
+        # changes the order locally, and the candidates are re-ranked by true
+        # geodesic distance. The need geometry is a scalar subquery so the planner
+        # treats it as a constant and can use an index-ordered scan.
+        cursor.execute(f"""
+            SELECT
+                cand.facility_id,
+                cand.name_fac,
+                cand.facility_type,
+                ST_AsGeoJSON(cand.geom)::json AS geom,
+                ROUND(ST_Distance(cand.geog, n.geog)::numeric, 1) AS distance_m
+            FROM (
+                SELECT f.facility_id, f.name_fac, f.facility_type, f.geom, f.geog
+                FROM facility f
+                {type_filter}
+                ORDER BY f.geom <-> (SELECT geom FROM need WHERE need_id = %(need_id)s)
+                LIMIT %(candidates)s
+            ) cand
+            JOIN need n ON n.need_id = %(need_id)s
+            ORDER BY distance_m ASC
+            LIMIT %(limit)s
+        """, {
+            "need_id":        need_id,
+            "relevant_types": tuple(CATEGORY_FACILITY_MAP.get(need_category, ())) or None,
+            "facility_type":  facility_type,
+            "candidates":     limit * KNN_CANDIDATE_FACTOR,
+            "limit":          limit
+        })
+
+        rows = cursor.fetchall()
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": row["geom"],
+            "properties": {
+                "facility_id":   row["facility_id"],
+                "name_fac":      row["name_fac"],
+                "facility_type": row["facility_type"],
+                "distance_m":    float(row["distance_m"])
+            }
+        }
+        for row in rows
+    ]
+
+    return jsonify({
+        "type": "FeatureCollection",
+        "features": features,
+        "meta": {
+            "need_id":              need_id,
+            "facility_type_filter": facility_type,
+            "count":                len(features)
+        }
+    })
+
+
+# Max number of need IDs accepted by POST /needs/nearest-facilities
+MAX_BATCH_NEEDS = 500
+
+# Max facilities per need returned by POST /needs/nearest-facilities
+MAX_BATCH_FACILITIES = 20
+
+
+@app.route('/needs/nearest-facilities', methods=['POST'])
+def get_nearest_facilities_batch():
+    """Returns the nearest relevant facilities for several needs in one query.
+
+    Runs one set-based LATERAL KNN query: for every need, the GIST index on
+    facility geom yields a small candidate set of relevant facility types
+    (CATEGORY_FACILITY_MAP, all types if the category is not mapped), which
+    is re-ranked by geodesic distance.
+
+    JSON body:
+        need_ids (list): need IDs to look up (max MAX_BATCH_NEEDS)
+        limit (int): facilities per need (default: 5, max MAX_BATCH_FACILITIES)
+
+    Returns:
+        JSON with a `results` object mapping each need_id to a GeoJSON
+        FeatureCollection of its nearest facilities ordered by distance, plus
+        meta with the IDs that were not found
+    """
+    body = request.get_json(silent=True) or {}
+    need_ids = body.get("need_ids")
+    limit = body.get("limit", 5)
+
+    if not isinstance(need_ids, list) or not need_ids \
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in need_ids):
+        return jsonify({"error": "need_ids must be a non-empty list of integers"}), 400
+    if len(need_ids) > MAX_BATCH_NEEDS:
+        return jsonify({"error": f"At most {MAX_BATCH_NEEDS} need_ids per request"}), 400
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_BATCH_FACILITIES:
+        return jsonify({"error": f"limit must be an integer between 1 and {MAX_BATCH_FACILITIES}"}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT
+                n.need_id,
+                fac.facility_id,
+                fac.name_fac,
+                fac.facility_type,
+                ST_AsGeoJSON(fac.geom)::json AS geom,
+                fac.distance_m
+            FROM need n
+            JOIN category c ON n.category = c.category_id
+            LEFT JOIN LATERAL (
                 SELECT
-                    f.facility_id,
-                    f.name_fac,
-                    f.facility_type,
-                    ST_AsGeoJSON(f.geom)::json AS geom,
-                    ROUND(ST_Distance(ST_Transform(f.geom, 4326)::geography, ST_Transform(n.geom, 4326)::geography)::numeric, 1) AS distance_m
-                FROM facility f
-                JOIN need n ON n.need_id = %(need_id)s
-                WHERE 1=1 {type_filter}
+                    cand.facility_id,
+                    cand.name_fac,
+                    cand.facility_type,
+                    cand.geom,
+                    ROUND(ST_Distance(cand.geog, n.geog)::numeric, 1) AS distance_m
+                FROM (
+                    SELECT f.facility_id, f.name_fac, f.facility_type, f.geom, f.geog
+                    FROM facility f
+                    WHERE NOT (%(category_map)s::jsonb ? c.name_cat)
+                       OR f.facility_type IN (
+                           SELECT jsonb_array_elements_text(%(category_map)s::jsonb -> c.name_cat)
+                       )
+                    ORDER BY f.geom <-> n.geom
+                    LIMIT %(candidates)s
+                ) cand
                 ORDER BY distance_m ASC
                 LIMIT %(limit)s
-            """, {"need_id": need_id, "facility_type": facility_type, "limit": limit})
+            ) fac ON TRUE
+            WHERE n.need_id = ANY(%(need_ids)s)
+            ORDER BY n.need_id, fac.distance_m ASC
+        """, {
+            "need_ids":     need_ids,
+            "category_map": Json(CATEGORY_FACILITY_MAP),
+            "candidates":   limit * KNN_CANDIDATE_FACTOR,
+            "limit":        limit
+        })
 
         rows = cursor.fetchall()
 
@@ -917,8 +1700,12 @@ def get_nearest_facilities(need_id):
         cursor.close()
         release_db_connection(conn)
 
-    features = [
-        {
+    results = {}
+    for row in rows:
+        collection = results.setdefault(str(row["need_id"]), {"type": "FeatureCollection", "features": []})
+        if row["facility_id"] is None:
+            continue
+        collection["features"].append({
             "type": "Feature",
             "geometry": row["geom"],
             "properties": {
@@ -927,17 +1714,14 @@ def get_nearest_facilities(need_id):
                 "facility_type": row["facility_type"],
                 "distance_m":    float(row["distance_m"])
             }
-        }
-        for row in rows
-    ]
+        })
 
     return jsonify({
-        "type": "FeatureCollection",
-        "features": features,
+        "results": results,
         "meta": {
-            "need_id":              need_id,
-            "facility_type_filter": facility_type,
-            "count":                len(features)
+            "limit":     limit,
+            "count":     len(results),
+            "not_found": [i for i in dict.fromkeys(need_ids) if str(i) not in results]
         }
     })
 
@@ -1191,37 +1975,67 @@ def get_offer(offer_id):
 
 
 
+# Columns and joins of the offers map layer, shared by /offers and /clusters
+OFFER_JOINS = """
+    FROM offer o
+    JOIN status_domain s ON o.status_id = s.status_id
+    JOIN category c ON o.category = c.category_id
+"""
+
+OFFERS_QUERY = """
+    SELECT o.offer_id,
+        o.user_id,
+        o.title,
+        o.descrip,
+        o.address_point,
+        s.code as status,
+        c.name_cat as category,
+        ST_AsGeoJSON(o.geom)::json as geom
+""" + OFFER_JOINS
+
+
 @app.route('/offers', methods=['GET'])
+@conditional("offer")
+@response_cache.cached("map", MAP_CACHE_TTL)
 def get_offers():
-    """Returns all offers as a GeoJSON FeatureCollection.
+    """Returns active offers as a GeoJSON FeatureCollection, optionally bounded to a viewport.
+
+    Query params:
+        bbox (str): optional `minx,miny,maxx,maxy` in EPSG:4326
+        limit (int): optional page size (max MAX_PAGE_SIZE)
+        cursor (int): optional offer_id to continue after (from meta.next_cursor)
 
     Returns:
-        GeoJSON FeatureCollection with offer properties and point geometry
+        GeoJSON FeatureCollection with offer properties and point geometry,
+        built by PostgreSQL when unpaginated. Paginated requests also include
+        meta.next_cursor (null on the last page)
+    """
+    try:
+        viewport = viewport_params("o", "offer_id")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = f"""
+        {OFFERS_QUERY}
+        WHERE s.code = 'active' {viewport["filter"]}
+        {viewport["order"]}
     """
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-                    SELECT o.offer_id,
-                        o.user_id,
-                        o.title,
-                        o.descrip,
-                        o.address_point,
-                        s.code as status,
-                        c.name_cat as category,
-                        ST_AsGeoJSON(o.geom)::json as geom
-                    FROM offer o
-                    JOIN status_domain s ON o.status_id = s.status_id
-                    JOIN category c ON o.category = c.category_id
-                    WHERE s.code = 'active'
-
-                """)
+        # The full collection is built by PostgreSQL and sent as is
+        if not viewport["paginated"]:
+            cursor.execute(geojson_featurecollection_sql(query))
+            return Response(cursor.fetchone()["collection"], mimetype="application/json")
+
+        cursor.execute(query, viewport["params"])
         offers = cursor.fetchall()
     finally:
         cursor.close()
         release_db_connection(conn)
 
-    return jsonify(format_geojson(offers))
+    return viewport_response(offers, viewport, "offer_id")
 
 
 @app.route('/create-offer', methods=['POST'])
@@ -1326,6 +2140,379 @@ def my_offers():
     return jsonify({"features": features})
 
 
+# ─── CHANGES ──────────────────────────────────────────────────────────────────
+
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """Returns the needs and offers created, updated or deleted since a cursor.
+
+    Rows carry the ID of the transaction that last wrote them (xact_id) and
+    the cursor is the oldest transaction still running when the previous
+    call read its snapshot: everything older was already committed (or
+    rolled back) and returned, so a slow transaction that commits later is
+    never skipped. Rows of transactions running at that time may come back
+    twice. Offers are returned whatever their status, so clients can drop
+    those that are no longer active.
+
+    Query params:
+        since (str): the `meta.next_since` of the previous call; without it
+            only the current cursor is returned (call it before loading
+            /needs and /offers)
+
+    Returns:
+        JSON with needs and offers FeatureCollections, the deleted need and
+        offer IDs and meta with the next_since to use; 410 if tombstones
+        newer than since were purged
+    """
+    since = request.args.get("since")
+    if since is not None and not (since.isascii() and since.isdigit() and len(since) <= 20):
+        return jsonify({"error": "since must be the meta.next_since of a previous call"}), 400
+
+    needs, offers, tombstones = [], [], []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # Taken before the reads, so their snapshots see every transaction older than it
+        cursor.execute("""
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS next_since,
+                   EXISTS (
+                       SELECT 1 FROM tombstone_purge WHERE purged_xact_id >= %(since)s::xid8
+                   ) AS expired
+        """, {"since": since})
+        row = cursor.fetchone()
+        next_since = row["next_since"]
+        if since is not None and row["expired"]:
+            return jsonify({"error": "since is older than the tombstone retention, reload /needs and /offers"}), 410
+
+        if since is not None:
+            cursor.execute(f"""
+                {NEEDS_QUERY}
+                WHERE n.xact_id >= %(since)s::xid8
+                ORDER BY n.xact_id
+            """, {"since": since})
+            needs = cursor.fetchall()
+
+            cursor.execute(f"""
+                {OFFERS_QUERY}
+                WHERE o.xact_id >= %(since)s::xid8
+                ORDER BY o.xact_id
+            """, {"since": since})
+            offers = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT table_name, row_id
+                FROM tombstone
+                WHERE xact_id >= %(since)s::xid8
+                ORDER BY xact_id
+            """, {"since": since})
+            tombstones = cursor.fetchall()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    return jsonify({
+        "needs":  feature_collection(needs),
+        "offers": feature_collection(offers),
+        "deleted": {
+            "needs":  [t["row_id"] for t in tombstones if t["table_name"] == "need"],
+            "offers": [t["row_id"] for t in tombstones if t["table_name"] == "offer"]
+        },
+        "meta": {
+            "since":         since,
+            "next_since":    next_since,
+            "need_count":    len(needs),
+            "offer_count":   len(offers),
+            "deleted_count": len(tombstones)
+        }
+    })
+
+
+# ─── CLUSTERS ─────────────────────────────────────────────────────────────────
+
+# Width of the EPSG:3857 world in metres, used to size the cluster grid
+WEB_MERCATOR_WORLD_WIDTH = 40075016.686
+
+# Cluster grid cell size in screen pixels (256 px tiles)
+CLUSTER_CELL_PX = 64
+
+# From this zoom level on, /clusters returns individual needs and offers
+CLUSTER_MAX_ZOOM = 14
+
+
+def cluster_cell_size(zoom):
+    """Returns the cluster grid cell size in EPSG:3857 metres for a zoom level.
+
+    Args:
+        zoom (int): web map zoom level
+
+    Returns:
+        float: cell width and height in metres
+    """
+    return WEB_MERCATOR_WORLD_WIDTH / (256 * 2 ** zoom) * CLUSTER_CELL_PX
+
+
+@app.route('/clusters', methods=['GET'])
+@conditional("need", "offer")
+@response_cache.cached("map", MAP_CACHE_TTL)
+def get_clusters():
+    """Returns needs and active offers grouped into grid clusters for the map.
+
+    Points are grouped server-side into square EPSG:3857 grid cells sized to
+    CLUSTER_CELL_PX on screen at the requested zoom. At CLUSTER_MAX_ZOOM and
+    above the individual needs and offers are returned instead, at most
+    MAX_PAGE_SIZE of each; meta.truncated tells the client when a layer had
+    more rows in the bbox.
+
+    Query params:
+        z (int): map zoom level (0-22, required)
+        bbox (str): optional `minx,miny,maxx,maxy` in EPSG:4326
+
+    Returns:
+        GeoJSON FeatureCollection. When clustered, each feature is a centroid
+        point with count, need_count, offer_count, categories and urgency
+        properties. Otherwise each feature is a need or offer with a `kind`
+        property. meta.clustered tells which shape was returned
+    """
+    zoom = request.args.get('z', None, type=int)
+    if zoom is None or not 0 <= zoom <= 22:
+        return jsonify({"error": "z must be an integer between 0 and 22"}), 400
+
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    need_filter = bbox_filter("n") if bbox else ""
+    offer_filter = bbox_filter("o") if bbox else ""
+    params = bbox_sql_params(bbox) if bbox else {}
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if zoom >= CLUSTER_MAX_ZOOM:
+            # One extra row per layer tells whether it was cut
+            params["limit"] = MAX_PAGE_SIZE + 1
+            cursor.execute(f"""
+                {NEEDS_QUERY}
+                WHERE 1=1 {need_filter}
+                ORDER BY n.need_id
+                LIMIT %(limit)s
+            """, params)
+            needs = cursor.fetchall()
+
+            cursor.execute(f"""
+                {OFFERS_QUERY}
+                WHERE s.code = 'active' {offer_filter}
+                ORDER BY o.offer_id
+                LIMIT %(limit)s
+            """, params)
+            offers = cursor.fetchall()
+        else:
+            params["cell"] = cluster_cell_size(zoom)
+            cursor.execute(f"""
+                WITH points AS (
+                    SELECT 'need' AS kind, c.name_cat AS category, u.code AS urgency, n.geom
+                    {NEED_JOINS}
+                    WHERE 1=1 {need_filter}
+                    UNION ALL
+                    SELECT 'offer' AS kind, c.name_cat AS category, NULL AS urgency, o.geom
+                    {OFFER_JOINS}
+                    WHERE s.code = 'active' {offer_filter}
+                )
+                SELECT
+                    FLOOR(ST_X(geom) / %(cell)s)::bigint AS cell_x,
+                    FLOOR(ST_Y(geom) / %(cell)s)::bigint AS cell_y,
+                    kind,
+                    category,
+                    urgency,
+                    COUNT(*)         AS count,
+                    SUM(ST_X(geom))  AS sum_x,
+                    SUM(ST_Y(geom))  AS sum_y
+                FROM points
+                WHERE geom IS NOT NULL
+                GROUP BY cell_x, cell_y, kind, category, urgency
+            """, params)
+            rows = cursor.fetchall()
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    if zoom >= CLUSTER_MAX_ZOOM:
+        truncated = [kind for kind, rows in (("need", needs), ("offer", offers)) if len(rows) > MAX_PAGE_SIZE]
+        features = []
+        for kind, rows in (("need", needs), ("offer", offers)):
+            for feature in feature_collection(rows[:MAX_PAGE_SIZE])["features"]:
+                feature["properties"]["kind"] = kind
+                features.append(feature)
+
+        return jsonify({
+            "type": "FeatureCollection",
+            "features": features,
+            "meta": {
+                "zoom":      zoom,
+                "bbox":      bbox,
+                "clustered": False,
+                "count":     len(features),
+                "limit":     MAX_PAGE_SIZE,
+                "truncated": bool(truncated),
+                "truncated_layers": truncated
+            }
+        })
+
+    # Merge the per category/urgency groups of each grid cell into one cluster
+    clusters = {}
+    for row in rows:
+        cluster = clusters.setdefault((row["cell_x"], row["cell_y"]), {
+            "count": 0, "need_count": 0, "offer_count": 0,
+            "sum_x": 0.0, "sum_y": 0.0,
+            "categories": {}, "urgency": {}
+        })
+        count = row["count"]
+        cluster["count"] += count
+        cluster[f"{row['kind']}_count"] += count
+        cluster["sum_x"] += row["sum_x"]
+        cluster["sum_y"] += row["sum_y"]
+        cluster["categories"][row["category"]] = cluster["categories"].get(row["category"], 0) + count
+        if row["urgency"]:
+            cluster["urgency"][row["urgency"]] = cluster["urgency"].get(row["urgency"], 0) + count
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [cluster["sum_x"] / cluster["count"], cluster["sum_y"] / cluster["count"]]
+            },
+            "properties": {
+                "count":       cluster["count"],
+                "need_count":  cluster["need_count"],
+                "offer_count": cluster["offer_count"],
+                "categories":  cluster["categories"],
+                "urgency":     cluster["urgency"]
+            }
+        }
+        for cluster in clusters.values()
+    ]
+
+    return jsonify({
+        "type": "FeatureCollection",
+        "features": features,
+        "meta": {
+            "zoom":         zoom,
+            "bbox":         bbox,
+            "clustered":    True,
+            "cell_size_m":  params["cell"],
+            "total_needs":  sum(f["properties"]["need_count"] for f in features),
+            "total_offers": sum(f["properties"]["offer_count"] for f in features)
+        }
+    })
+
+
+# ─── VECTOR TILES ─────────────────────────────────────────────────────────────
+
+# Mapbox Vector Tile layers. All geometries are already stored in EPSG:3857,
+# the tile grid CRS, so ST_AsMVTGeom can clip them without reprojection.
+TILE_LAYERS = {
+    "needs": {
+        "columns": """n.need_id, n.title, s.code AS status, u.code AS urgency,
+                      c.name_cat AS category, a.status_ass AS assignment_status""",
+        "geom":    "n.geom",
+        "from":    NEED_JOINS,
+        "where":   "1=1",
+        "max_age": 0
+    },
+    "offers": {
+        "columns": "o.offer_id, o.title, s.code AS status, c.name_cat AS category",
+        "geom":    "o.geom",
+        "from":    OFFER_JOINS,
+        "where":   "s.code = 'active'",
+        "max_age": 0
+    },
+    "facilities": {
+        "columns": "f.facility_id, f.name_fac, f.facility_type",
+        "geom":    "f.geom",
+        "from":    "FROM facility f",
+        "where":   "1=1",
+        # Reference layers only change when the ETL runs
+        "max_age": 3600
+    },
+    "admin-areas": {
+        "columns": "a.area_id, a.name_area, a.admin_level",
+        "geom":    "a.geom",
+        "from":    "FROM administrative_area a",
+        "where":   "(%(admin_level)s::int IS NULL OR a.admin_level = %(admin_level)s)",
+        "max_age": 3600
+    }
+}
+
+# Tile extent and buffer in tile coordinate units
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_tile(layer, z, x, y):
+    """Returns one Mapbox Vector Tile of a map layer.
+
+    Args:
+        layer (str): one of 'needs', 'offers', 'facilities', 'admin-areas'
+        z (int): tile zoom level (0-22)
+        x (int): tile column
+        y (int): tile row
+
+    Query params:
+        admin_level (int): optional admin level filter for the 'admin-areas' layer
+
+    Returns:
+        Protobuf encoded tile (application/vnd.mapbox-vector-tile), empty if
+        nothing falls inside it, or 404 for an unknown layer or tile
+    """
+    tile_layer = TILE_LAYERS.get(layer)
+    if tile_layer is None:
+        return jsonify({"error": f"Unknown tile layer '{layer}'"}), 404
+    if not 0 <= z <= 22 or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        return jsonify({"error": f"Tile {z}/{x}/{y} out of range"}), 404
+
+    admin_level = request.args.get('admin_level', None, type=int)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            WITH mvtgeom AS (
+                SELECT
+                    ST_AsMVTGeom({tile_layer["geom"]}, ST_TileEnvelope(%(z)s, %(x)s, %(y)s),
+                                 {MVT_EXTENT}, {MVT_BUFFER}, true) AS geom,
+                    {tile_layer["columns"]}
+                {tile_layer["from"]}
+                WHERE {tile_layer["where"]}
+                  AND {tile_layer["geom"]} && ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => {MVT_BUFFER / MVT_EXTENT})
+            )
+            SELECT ST_AsMVT(mvtgeom.*, %(layer)s, {MVT_EXTENT}, 'geom') AS tile
+            FROM mvtgeom
+        """, {"z": z, "x": x, "y": y, "layer": layer, "admin_level": admin_level})
+        row = cursor.fetchone()
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    tile = bytes(row["tile"]) if row and row["tile"] is not None else b""
+    response = Response(tile, mimetype="application/vnd.mapbox-vector-tile")
+    if tile_layer["max_age"]:
+        response.headers["Cache-Control"] = f"public, max-age={tile_layer['max_age']}"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 # ─── ASSIGNMENTS ──────────────────────────────────────────────────────────────
 
 def send_assignment_email(to_email, accepter_email, item_type, title):
@@ -1564,9 +2751,234 @@ def my_offers_for_need(need_id):
     return jsonify({"offers": offers})
 
 
+# ─── MATCHING ─────────────────────────────────────────────────────────────────
+
+# Default and max distance (m) between a need and an offer to be matched
+MATCHING_DEFAULT_RADIUS = 5000
+MATCHING_MAX_RADIUS = 50000
+
+# Nearest offers kept per need in the candidate graph
+MATCHING_CANDIDATES_PER_NEED = 10
+
+
+def solve_matching(candidates):
+    """Greedy weighted matching of needs to offers.
+
+    Every candidate edge is scored by urgency weight times distance decay,
+    so a critical need close to an offer is served first and a low urgency
+    need only takes an offer no more urgent need could use. Edges are taken
+    in score order while both ends are still free, which keeps every need
+    and offer in at most one pair (as the assignments UNIQUE constraints
+    require).
+
+    Args:
+        candidates (list): rows with need_id, offer_id, distance_m,
+            urgency_weight and radius_m
+
+    Returns:
+        list of the chosen candidate rows, each with an added `score`
+    """
+    scored = [
+        dict(row, score=round(row["urgency_weight"] * (1 - float(row["distance_m"]) / row["radius_m"]), 4))
+        for row in candidates
+    ]
+    scored.sort(key=lambda row: (-row["score"], row["need_id"], row["offer_id"]))
+
+    used_needs, used_offers, matches = set(), set(), []
+    for row in scored:
+        if row["need_id"] in used_needs or row["offer_id"] in used_offers:
+            continue
+        used_needs.add(row["need_id"])
+        used_offers.add(row["offer_id"])
+        matches.append(row)
+    return matches
+
+
+@app.route('/matching/run', methods=['POST'])
+def run_matching():
+    """Computes proposed assignments between active needs and offers in a region.
+
+    Builds a candidate graph with a LATERAL KNN query: for every active,
+    unassigned need in the region, the nearest active offers of the same
+    category within the radius (the `geog` GIST index does the spatial
+    bucketing). The graph is solved with `solve_matching`, weighting
+    urgency from urgency_domain and distance.
+
+    JSON body:
+        area_id (int): optional administrative area (municipality or parish)
+        bbox (str|list): optional `minx,miny,maxx,maxy` in EPSG:4326
+        radius (int): max need-offer distance in metres (default: 5000)
+        apply (bool): if true, inserts the pairs as `proposed` assignments
+            (requires login, default: false). Only pairs where the caller
+            owns the need or the offer are matched then, and the other
+            owner of each pair is notified like in create_assignment
+
+    Returns:
+        JSON with the list of proposed pairs and meta counts; 201 if applied
+    """
+    body = request.get_json(silent=True) or {}
+    area_id = body.get("area_id")
+    radius = body.get("radius", MATCHING_DEFAULT_RADIUS)
+    apply = body.get("apply", False)
+
+    if not isinstance(apply, bool):
+        return jsonify({"error": "apply must be a JSON boolean"}), 400
+    if apply and "user_id" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    if not isinstance(radius, int) or not 0 < radius <= MATCHING_MAX_RADIUS:
+        return jsonify({"error": f"radius must be an integer between 1 and {MATCHING_MAX_RADIUS}"}), 400
+    if area_id is not None and not isinstance(area_id, int):
+        return jsonify({"error": "area_id must be an integer"}), 400
+
+    bbox_value = body.get("bbox")
+    if isinstance(bbox_value, list):
+        bbox_value = ",".join(str(v) for v in bbox_value)
+    try:
+        bbox = parse_bbox(bbox_value)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if area_id is None and bbox is None:
+        return jsonify({"error": "area_id or bbox is required"}), 400
+
+    params = {
+        "radius":     radius,
+        "candidates": MATCHING_CANDIDATES_PER_NEED,
+        "area_id":    area_id,
+        "owner_id":   session["user_id"] if apply else None
+    }
+    if bbox:
+        params.update(bbox_sql_params(bbox))
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        area_filter_sql = ""
+        if area_id is not None:
+            cursor.execute("""
+                SELECT admin_level FROM administrative_area WHERE area_id = %s
+            """, (area_id,))
+            area = cursor.fetchone()
+            area_column = ADMIN_LEVEL_COLUMNS.get(area["admin_level"]) if area else None
+            if not area_column:
+                return jsonify({"error": "Area not found"}), 404
+            area_filter_sql = f"AND n.{area_column} = %(area_id)s"
+
+        cursor.execute(f"""
+            WITH active AS (
+                SELECT status_id FROM status_domain WHERE code = 'active'
+            )
+            SELECT
+                n.need_id,
+                cand.offer_id,
+                c.name_cat AS category,
+                u.code     AS urgency,
+                (SELECT MAX(urgency_id) FROM urgency_domain) - u.urgency_id + 1 AS urgency_weight,
+                cand.distance_m,
+                %(radius)s AS radius_m
+            FROM need n
+            JOIN category c       ON n.category = c.category_id
+            JOIN urgency_domain u ON n.urgency  = u.urgency_id
+            JOIN LATERAL (
+                SELECT
+                    o.offer_id,
+                    ROUND(ST_Distance(o.geog, n.geog)::numeric, 1) AS distance_m
+                FROM offer o
+                WHERE o.category  = n.category
+                  AND o.status_id = (SELECT status_id FROM active)
+                  AND ST_DWithin(o.geog, n.geog, %(radius)s)
+                  AND NOT EXISTS (SELECT 1 FROM assignments a WHERE a.offer_id = o.offer_id)
+                  AND (%(owner_id)s::int IS NULL OR n.user_id = %(owner_id)s OR o.user_id = %(owner_id)s)
+                ORDER BY o.geog <-> n.geog
+                LIMIT %(candidates)s
+            ) cand ON TRUE
+            WHERE n.status_id = (SELECT status_id FROM active)
+              AND NOT EXISTS (SELECT 1 FROM assignments a WHERE a.need_id = n.need_id)
+              {area_filter_sql}
+              {bbox_filter('n') if bbox else ""}
+        """, params)
+
+        candidates = cursor.fetchall()
+        matches = solve_matching(candidates)
+
+        notifications = []
+        if apply and matches:
+            pair_ids = {
+                "need_ids":  [m["need_id"] for m in matches],
+                "offer_ids": [m["offer_id"] for m in matches]
+            }
+            cursor.execute("""
+                INSERT INTO assignments (need_id, offer_id, notes)
+                SELECT need_id, offer_id, 'Proposed by bulk matching'
+                FROM unnest(%(need_ids)s::integer[], %(offer_ids)s::integer[]) AS m(need_id, offer_id)
+            """, pair_ids)
+
+            # Same recipients as create_assignment: the owner on the other side of the caller
+            cursor.execute("""
+                SELECT n.title  AS need_title,
+                       o.title  AS offer_title,
+                       n.user_id AS need_owner,
+                       nu.email AS need_owner_email,
+                       ou.email AS offer_owner_email,
+                       (SELECT email FROM app_user WHERE user_id = %(user_id)s) AS accepter_email
+                FROM unnest(%(need_ids)s::integer[], %(offer_ids)s::integer[]) AS m(need_id, offer_id)
+                JOIN need n      ON n.need_id  = m.need_id
+                JOIN offer o     ON o.offer_id = m.offer_id
+                JOIN app_user nu ON nu.user_id = n.user_id
+                JOIN app_user ou ON ou.user_id = o.user_id
+            """, dict(pair_ids, user_id=session["user_id"]))
+            notifications = cursor.fetchall()
+            conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+    # Sent after the commit, so no one is told about assignments that were rolled back
+    notified = 0
+    for item in notifications:
+        try:
+            if item["need_owner"] == session["user_id"]:
+                send_assignment_email(item["offer_owner_email"], item["accepter_email"], "offer", item["offer_title"])
+            else:
+                send_assignment_email(item["need_owner_email"], item["accepter_email"], "need", item["need_title"])
+            notified += 1
+        except Exception as e:
+            app.logger.warning("matching notification failed: %s", e)
+
+    pairs = [
+        {
+            "need_id":    m["need_id"],
+            "offer_id":   m["offer_id"],
+            "category":   m["category"],
+            "urgency":    m["urgency"],
+            "distance_m": float(m["distance_m"]),
+            "score":      m["score"]
+        }
+        for m in matches
+    ]
+
+    return jsonify({
+        "matches": pairs,
+        "meta": {
+            "radius_m":         radius,
+            "candidate_edges":  len(candidates),
+            "candidate_needs":  len({c["need_id"] for c in candidates}),
+            "matched":          len(pairs),
+            "applied":          apply,
+            "notified":         notified
+        }
+    }), 201 if apply else 200
+
+
 # ─── FACILITIES ───────────────────────────────────────────────────────────────
 
 @app.route("/facility-types", methods=["GET"])
+@response_cache.cached("reference", REFERENCE_CACHE_TTL)
 def get_facility_types():
     """Returns a list of distinct facility types present in the database.
 
@@ -1585,9 +2997,15 @@ def get_facility_types():
 
 
 @app.route('/facilities', methods=['GET'])
+@conditional("etl")
+@response_cache.cached("reference", REFERENCE_CACHE_TTL)
 def get_facilities():
     """Returns facilities as a GeoJSON FeatureCollection, optionally filtered by type.
 
+    The full dump is streamed (and so not cached). Filtered collections are
+    smaller and built by PostgreSQL in one text value, which the response
+    cache stores.
+
     Query params:
         types (list): optional list of facility_type values to filter by
 
@@ -1595,34 +3013,32 @@ def get_facilities():
         GeoJSON FeatureCollection with facility properties and point geometry
     """
     types = request.args.getlist("types")
+    query = """
+        SELECT facility_id, name_fac, facility_type,
+               ST_AsGeoJSON(geom)::json as geom
+        FROM facility
+    """
+
+    if not types:
+        return stream_geojson_response(query)
 
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        if types:
-            cursor.execute("""
-                SELECT facility_id, name_fac, facility_type,
-                       ST_AsGeoJSON(geom)::json as geom
-                FROM facility
-                WHERE facility_type IN %s
-            """, (tuple(types),))
-        else:
-            cursor.execute("""
-                SELECT facility_id, name_fac, facility_type,
-                       ST_AsGeoJSON(geom)::json as geom
-                FROM facility
-            """)
-        facilities = cursor.fetchall()
+        cursor.execute(geojson_featurecollection_sql(f"{query} WHERE facility_type IN %(types)s"),
+                       {"types": tuple(types)})
+        return Response(cursor.fetchone()["collection"], mimetype="application/json")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     finally:
         cursor.close()
         release_db_connection(conn)
 
-    return jsonify(format_geojson(facilities))
-
 
 # ─── URGENCY ──────────────────────────────────────────────────────────────────
 
 @app.route('/urgency-levels', methods=['GET'])
+@response_cache.cached("reference", REFERENCE_CACHE_TTL)
 def get_urgency_levels():
     """Returns all urgency levels ordered by severity.
 
@@ -1647,6 +3063,7 @@ def get_urgency_levels():
 # ─── ADMINISTRATIVE AREAS ─────────────────────────────────────────────────────
 
 @app.route("/admin-areas", methods=["GET"])
+@response_cache.cached("reference", REFERENCE_CACHE_TTL)
 def get_admin_areas():
     """Searches administrative areas by name (autocomplete).
 
@@ -1675,48 +3092,112 @@ def get_admin_areas():
     return jsonify(areas)
 
 
+# Simplified boundary bands precomputed by the ETL in administrative_area_simplified,
+# as (max zoom, tolerance in metres, GeoJSON decimal digits). Must match the
+# SIMPLIFY_TOLERANCES of etl/run_etl.py
+ADMIN_AREA_BANDS = [
+    (7,  1000, 3),
+    (9,  250,  4),
+    (11, 50,   4),
+    (13, 10,   5),
+]
+
+# Decimal digits for full resolution geometries (~0.1 m)
+ADMIN_AREA_FULL_PRECISION = 6
+
+
+def admin_area_band(zoom=None, tolerance=None):
+    """Picks the simplified boundary band for a zoom level or tolerance.
+
+    A zoom level maps to the first band whose max zoom covers it. A tolerance
+    maps to the coarsest band not coarser than it. Anything finer than the
+    last band, or no param at all, means full resolution.
+
+    Args:
+        zoom (int): map zoom level
+        tolerance (float): max acceptable simplification tolerance in metres
+
+    Returns:
+        tuple (tolerance_m, decimal digits); tolerance_m is None for full resolution
+    """
+    if zoom is not None:
+        for max_zoom, band_tolerance, precision in ADMIN_AREA_BANDS:
+            if zoom <= max_zoom:
+                return band_tolerance, precision
+    elif tolerance is not None:
+        for _, band_tolerance, precision in ADMIN_AREA_BANDS:
+            if band_tolerance <= tolerance:
+                return band_tolerance, precision
+    return None, ADMIN_AREA_FULL_PRECISION
+
+
 @app.route('/admin-areas/stats', methods=['GET'])
+@conditional("need", "offer", "etl")
+@response_cache.cached("map", MAP_CACHE_TTL)
 def get_admin_area_stats():
     """Returns active need and offer counts per administrative area.
 
-    Uses a spatial join (ST_Within) to count how many active needs and offers
-    fall inside each administrative area polygon. Includes a gap_score
+    Counts are read from the area_stats table, which database triggers keep
+    in sync whenever a need or offer is created, moved, deleted or changes
+    status, so no spatial join runs per request. Includes a gap_score
     (needs minus offers) useful for choropleth mapping.
 
+    Polygons come from the simplified band matching `zoom` or `tolerance`
+    (see ADMIN_AREA_BANDS), with coordinate precision trimmed to match.
+    Without either param the full resolution geometry is returned.
+
     Query params:
         admin_level (int): optional filter by admin level (6 = municipalities, 8 = parishes)
+        category (int): optional category_id to count only needs/offers of that category
+        zoom (int): optional map zoom level used to pick the simplification band
+        tolerance (float): optional max simplification tolerance in metres
 
     Returns:
         GeoJSON FeatureCollection of area polygons with need_count, offer_count
         and gap_score properties, plus summary totals in meta
     """
     admin_level = request.args.get('admin_level', None, type=int)
+    category = request.args.get('category', None, type=int)
+    zoom = request.args.get('zoom', None, type=int)
+    tolerance = request.args.get('tolerance', None, type=float)
+
+    band_tolerance, precision = admin_area_band(zoom, tolerance)
 
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
         level_filter = "AND a.admin_level = %(admin_level)s" if admin_level else ""
+        category_filter = "AND st.category_id = %(category)s" if category else ""
 
         cursor.execute(f"""
             SELECT
                 a.area_id,
                 a.name_area,
                 a.admin_level,
-                ST_AsGeoJSON(ST_Transform(a.geom, 4326))::json AS geom,
-                COUNT(DISTINCT n.need_id)  AS need_count,
-                COUNT(DISTINCT o.offer_id) AS offer_count
+                ST_AsGeoJSON(COALESCE(simp.geom, ST_Transform(a.geom, 4326)), %(precision)s)::json AS geom,
+                COALESCE(counts.need_count, 0)  AS need_count,
+                COALESCE(counts.offer_count, 0) AS offer_count
             FROM administrative_area a
-            LEFT JOIN need n
-                ON ST_Within(n.geom, a.geom)
-                AND n.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
-            LEFT JOIN offer o
-                ON ST_Within(o.geom, a.geom)
-                AND o.status_id = (SELECT status_id FROM status_domain WHERE code = 'active')
+            LEFT JOIN administrative_area_simplified simp
+                ON simp.area_id = a.area_id
+                AND simp.tolerance_m = %(tolerance)s
+            LEFT JOIN (
+                SELECT st.area_id,
+                       SUM(st.need_count)  AS need_count,
+                       SUM(st.offer_count) AS offer_count
+                FROM area_stats st
+                WHERE 1=1 {category_filter}
+                GROUP BY st.area_id
+            ) counts ON counts.area_id = a.area_id
             WHERE 1=1 {level_filter}
-            GROUP BY a.area_id, a.name_area, a.admin_level, a.geom
             ORDER BY need_count DESC
-        """, {"admin_level": admin_level})
+        """, {
+            "admin_level": admin_level,
+            "category":    category,
+            "tolerance":   band_tolerance,
+            "precision":   precision
+        })
 
         rows = cursor.fetchall()
 
@@ -1748,6 +3229,8 @@ def get_admin_area_stats():
         "features": features,
         "meta": {
             "admin_level_filter":  admin_level,
+            "category_filter":     category,
+            "tolerance_m":         band_tolerance,
             "total_areas":         len(features),
             "total_active_needs":  sum(f["properties"]["need_count"] for f in features),
             "total_active_offers": sum(f["properties"]["offer_count"] for f in features)
@@ -1757,6 +3240,33 @@ def get_admin_area_stats():
 
 # ─── SEARCH ───────────────────────────────────────────────────────────────────
 
+# Column of need/offer holding the containing area ID for each admin level
+ADMIN_LEVEL_COLUMNS = {
+    6: "municipality_id",
+    8: "parish_id"
+}
+
+
+def area_filter(geom_column):
+    """Returns SQL that keeps rows whose point falls inside an administrative area.
+
+    The test runs against the ST_Subdivide pieces in administrative_area_subdivided,
+    which have few vertices each and their own GIST index, instead of the full
+    CAOP multipolygon. ST_Intersects is used so points lying on the internal
+    cut lines between pieces still match.
+
+    Args:
+        geom_column (str): qualified point geometry column (e.g. 'n.geom')
+
+    Returns:
+        str: SQL condition with one `%s` placeholder for the area_id
+    """
+    return f"""EXISTS (
+        SELECT 1 FROM administrative_area_subdivided p
+        WHERE p.area_id = %s AND ST_Intersects({geom_column}, p.geom)
+    )"""
+
+
 @app.route("/search", methods=["GET"])
 def search():
     """Filters needs, offers and facilities by administrative area and type.
@@ -1767,7 +3277,7 @@ def search():
         facilityTypes (list): facility types to include (repeatable param)
 
     Returns:
-        JSON object with needs, offers and facility lists
+        JSON object with needs, offers and facility lists, serialized by PostgreSQL
     """
     query = request.args.get("query", "").strip().lower()
     filter_type = request.args.get("type", "all")
@@ -1775,65 +3285,78 @@ def search():
 
     conn = get_db_connection()
     cursor = conn.cursor()
-    results = {"needs": [], "offers": [], "facility": []}
+    results = {"needs": "[]", "offers": "[]", "facility": "[]"}
 
     try:
-        # Resolve admin area name to geometry for spatial filtering
+        # Resolve admin area name to its ID; the polygon itself is never sent back and forth
         if query:
             cursor.execute("""
-                SELECT geom
+                SELECT area_id, admin_level
                 FROM administrative_area
                 WHERE LOWER(name_area) LIKE %s
             """, (f"%{query}%",))
             area = cursor.fetchone()
-            geom_filter = area["geom"] if area else None
         else:
-            geom_filter = None
+            area = None
+
+        # Needs and offers store their containing municipality/parish IDs, so
+        # the area filter is an indexed integer lookup instead of ST_Within
+        area_column = ADMIN_LEVEL_COLUMNS.get(area["admin_level"]) if area else None
 
         # Needs
         if filter_type in ("needs", "all"):
             sql = "SELECT n.need_id, n.title, n.descrip, c.name_cat AS category, n.urgency, ST_AsGeoJSON(n.geom) AS geom FROM need AS n JOIN status_domain s ON n.status_id = s.status_id AND s.code = 'active' JOIN category c ON n.category = c.category_id"
-            if geom_filter:
-                sql += " WHERE ST_Within(geom, %s)"
-                cursor.execute(sql, (geom_filter,))
+            if area_column:
+                sql += f" WHERE n.{area_column} = %s"
+                cursor.execute(json_rows_sql(sql), (area["area_id"],))
+            elif area:
+                sql += f" WHERE {area_filter('n.geom')}"
+                cursor.execute(json_rows_sql(sql), (area["area_id"],))
             else:
-                cursor.execute(sql)
-            results["needs"] = cursor.fetchall()
+                cursor.execute(json_rows_sql(sql))
+            results["needs"] = cursor.fetchone()["rows_json"]
 
         # Offers
         if filter_type in ("offers", "all"):
             sql = "SELECT descrip, ST_AsGeoJSON(geom) AS geom FROM offer AS o JOIN status_domain s ON o.status_id = s.status_id AND s.code = 'active'"
-            if geom_filter:
-                sql += " WHERE ST_Within(geom, %s)"
-                cursor.execute(sql, (geom_filter,))
+            if area_column:
+                sql += f" WHERE o.{area_column} = %s"
+                cursor.execute(json_rows_sql(sql), (area["area_id"],))
+            elif area:
+                sql += f" WHERE {area_filter('o.geom')}"
+                cursor.execute(json_rows_sql(sql), (area["area_id"],))
             else:
-                cursor.execute(sql)
-            results["offers"] = cursor.fetchall()
+                cursor.execute(json_rows_sql(sql))
+            results["offers"] = cursor.fetchone()["rows_json"]
 
         # Facilities (with optional type filter)
         if filter_type in ("facility", "all"):
             if facility_types and "all" not in facility_types:
                 types_clause = tuple(facility_types)
                 sql = "SELECT name_fac, facility_type, ST_AsGeoJSON(geom) AS geom FROM facility WHERE facility_type IN %s"
-                if geom_filter:
-                    sql += " AND ST_Within(geom, %s)"
-                    cursor.execute(sql, (types_clause, geom_filter))
+                if area:
+                    sql += f" AND {area_filter('facility.geom')}"
+                    cursor.execute(json_rows_sql(sql), (types_clause, area["area_id"]))
                 else:
-                    cursor.execute(sql, (types_clause,))
+                    cursor.execute(json_rows_sql(sql), (types_clause,))
             else:
                 sql = "SELECT name_fac, facility_type, ST_AsGeoJSON(geom) AS geom FROM facility"
-                if geom_filter:
-                    sql += " WHERE ST_Within(geom, %s)"
-                    cursor.execute(sql, (geom_filter,))
+                if area:
+                    sql += f" WHERE {area_filter('facility.geom')}"
+                    cursor.execute(json_rows_sql(sql), (area["area_id"],))
                 else:
-                    cursor.execute(sql)
-            results["facility"] = cursor.fetchall()
+                    cursor.execute(json_rows_sql(sql))
+            results["facility"] = cursor.fetchone()["rows_json"]
 
     finally:
         cursor.close()
         release_db_connection(conn)
 
-    return jsonify(results)
+    # Each list was serialized by PostgreSQL; only the outer object is assembled here
+    return Response(
+        "{" + ", ".join(f'"{key}": {rows_json}' for key, rows_json in results.items()) + "}",
+        mimetype="application/json"
+    )
 
 
 if __name__ == '__main__':
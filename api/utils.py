@@ -1,3 +1,6 @@
+import json
+
+
 def format_geojson_feature(row, geometry_column="geom"):
     return {
         "type": "Feature",
@@ -15,9 +18,37 @@ def format_geojson_featurecollection(rows, geometry_column="geom"):
         ]
     }
 
+# Always a FeatureCollection, so clients need no special case for a single row
 def format_geojson(rows, geometry_column="geom"):
-    if not rows:
-        return {"type": "FeatureCollection", "features": []}
-    if len(rows) == 1:
-        return format_geojson_feature(rows[0], geometry_column)
     return format_geojson_featurecollection(rows, geometry_column)
+
+# Streams a FeatureCollection as JSON text chunks from an executed (server-side) cursor.
+# Rows are tuples and the geometry column must already be GeoJSON text, which is
+# written verbatim. If `meta` is given it is closed with the feature count.
+def stream_geojson_featurecollection(cursor, geometry_column="geom", batch_size=1000, meta=None):
+    yield '{"type": "FeatureCollection", "features": ['
+    columns = None
+    count = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if columns is None:
+            columns = [column.name for column in cursor.description]
+            geometry_index = columns.index(geometry_column)
+        features = []
+        for row in rows:
+            properties = {
+                column: value for i, (column, value) in enumerate(zip(columns, row)) if i != geometry_index
+            }
+            geometry = row[geometry_index]
+            features.append(
+                '{"type": "Feature", "geometry": ' + (geometry if geometry is not None else "null")
+                + ', "properties": ' + json.dumps(properties, default=str) + '}'
+            )
+        yield ("," if count else "") + ",".join(features)
+        count += len(rows)
+    if meta is None:
+        yield ']}'
+    else:
+        yield '], "meta": ' + json.dumps(dict(meta, count=count), default=str) + '}'
@@ -6,17 +6,53 @@ DROP TRIGGER IF EXISTS trg_assignment_update_completed ON assignments;
 DROP TRIGGER IF EXISTS trg_assignment_insert_sync_status ON assignments;
 DROP TRIGGER IF EXISTS update_offer_updated_at ON offer;
 DROP TRIGGER IF EXISTS update_need_updated_at ON need;
-
+DROP TRIGGER IF EXISTS trg_offer_tombstone ON offer;
+DROP TRIGGER IF EXISTS trg_need_tombstone ON need;
+DROP TRIGGER IF EXISTS trg_etl_load_notify_change ON etl_load;
+DROP TRIGGER IF EXISTS trg_assignments_notify_change ON assignments;
+DROP TRIGGER IF EXISTS trg_offer_notify_change ON offer;
+DROP TRIGGER IF EXISTS trg_need_notify_change ON need;
+DROP TRIGGER IF EXISTS trg_offer_area_stats ON offer;
+DROP TRIGGER IF EXISTS trg_need_area_stats ON need;
+DROP TRIGGER IF EXISTS trg_offer_admin_areas ON offer;
+DROP TRIGGER IF EXISTS trg_need_admin_areas ON need;
+
+DROP FUNCTION IF EXISTS purge_tombstones(INTEGER);
+DROP FUNCTION IF EXISTS running_xacts_before(XID8);
+DROP FUNCTION IF EXISTS record_tombstone();
+DROP FUNCTION IF EXISTS notify_map_change();
+DROP FUNCTION IF EXISTS refresh_area_stats();
+DROP FUNCTION IF EXISTS sync_area_stats();
+DROP FUNCTION IF EXISTS apply_area_stats_delta(INTEGER, INTEGER, INTEGER, INTEGER);
+DROP FUNCTION IF EXISTS assign_admin_areas();
+DROP FUNCTION IF EXISTS set_admin_area_ids();
+DROP FUNCTION IF EXISTS containing_area_id(GEOMETRY, INTEGER);
+DROP FUNCTION IF EXISTS sync_facility_load();
+DROP FUNCTION IF EXISTS swap_reference_load();
+DROP FUNCTION IF EXISTS prepare_reference_load(INTEGER, INTEGER[]);
+DROP FUNCTION IF EXISTS begin_reference_load();
+DROP FUNCTION IF EXISTS refresh_admin_area_subdivided(INTEGER);
+DROP FUNCTION IF EXISTS refresh_admin_area_simplified(INTEGER[]);
 DROP FUNCTION IF EXISTS prevent_invalid_assignment();
 DROP FUNCTION IF EXISTS sync_status_on_assignment_completed();
 DROP FUNCTION IF EXISTS sync_status_on_assignment_insert();
 DROP FUNCTION IF EXISTS update_updated_at_column();
 
+DROP TABLE IF EXISTS tombstone_purge CASCADE;
+DROP TABLE IF EXISTS tombstone CASCADE;
+DROP TABLE IF EXISTS etl_load CASCADE;
+DROP TABLE IF EXISTS area_stats CASCADE;
 DROP TABLE IF EXISTS assignments CASCADE;
 DROP TABLE IF EXISTS offer CASCADE;
 DROP TABLE IF EXISTS need CASCADE;
 
+DROP TABLE IF EXISTS facility_load CASCADE;
+DROP TABLE IF EXISTS administrative_area_simplified_load CASCADE;
+DROP TABLE IF EXISTS administrative_area_subdivided_load CASCADE;
+DROP TABLE IF EXISTS administrative_area_load CASCADE;
 DROP TABLE IF EXISTS facility CASCADE;
+DROP TABLE IF EXISTS administrative_area_subdivided CASCADE;
+DROP TABLE IF EXISTS administrative_area_simplified CASCADE;
 DROP TABLE IF EXISTS administrative_area CASCADE;
 
 DROP TABLE IF EXISTS urgency_domain CASCADE;
@@ -87,10 +123,14 @@ CREATE TABLE need (
     category INTEGER NOT NULL,
     urgency INTEGER NOT NULL DEFAULT 3,
     geom GEOMETRY(Point, 3857) NOT NULL,
+    geog GEOGRAPHY(Point, 4326) GENERATED ALWAYS AS (ST_Transform(geom, 4326)::geography) STORED,
     address_point VARCHAR(500),
     status_id INTEGER NOT NULL DEFAULT 1,
+    municipality_id INTEGER,
+    parish_id INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    xact_id XID8 NOT NULL DEFAULT pg_current_xact_id(),
     CONSTRAINT fk_need_user FOREIGN KEY (user_id) REFERENCES app_user(user_id) ON DELETE CASCADE,
     CONSTRAINT fk_need_category FOREIGN KEY (category) REFERENCES category(category_id) ON DELETE RESTRICT,
     CONSTRAINT fk_need_status FOREIGN KEY (status_id) REFERENCES status_domain(status_id) ON DELETE RESTRICT,
@@ -105,10 +145,14 @@ CREATE TABLE offer (
     descrip TEXT NOT NULL,
     category INTEGER NOT NULL,
     geom GEOMETRY(Point, 3857),
+    geog GEOGRAPHY(Point, 4326) GENERATED ALWAYS AS (ST_Transform(geom, 4326)::geography) STORED,
     address_point VARCHAR(500),
     status_id INTEGER NOT NULL DEFAULT 1,    
+    municipality_id INTEGER,
+    parish_id INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    xact_id XID8 NOT NULL DEFAULT pg_current_xact_id(),
     CONSTRAINT fk_offer_user FOREIGN KEY (user_id) REFERENCES app_user(user_id) ON DELETE CASCADE,
     CONSTRAINT fk_offer_category FOREIGN KEY (category) REFERENCES category(category_id) ON DELETE RESTRICT,
     CONSTRAINT fk_offer_status FOREIGN KEY (status_id) REFERENCES status_domain(status_id) ON DELETE RESTRICT   
@@ -138,13 +182,74 @@ CREATE TABLE administrative_area (
     geom GEOMETRY(Geometry, 3857) NOT NULL
 );
 
+-- Administrative Areas split with ST_Subdivide into pieces with a capped vertex
+-- count, for fast point-in-polygon tests. Rebuilt by the ETL with
+-- prepare_reference_load() on each load.
+CREATE TABLE administrative_area_subdivided (
+    piece_id SERIAL PRIMARY KEY,
+    area_id INTEGER NOT NULL,
+    admin_level INTEGER NOT NULL,
+    geom GEOMETRY(Geometry, 3857) NOT NULL,
+    CONSTRAINT fk_subdivided_area FOREIGN KEY (area_id) REFERENCES administrative_area(area_id) ON DELETE CASCADE
+);
+
+-- Administrative Areas simplified with ST_SimplifyPreserveTopology for several
+-- zoom bands (tolerance in metres), stored in EPSG:4326 ready for GeoJSON output.
+-- Rebuilt by the ETL with prepare_reference_load() on each load.
+CREATE TABLE administrative_area_simplified (
+    area_id INTEGER NOT NULL,
+    tolerance_m INTEGER NOT NULL,
+    geom GEOMETRY(Geometry, 4326) NOT NULL,
+    PRIMARY KEY (area_id, tolerance_m),
+    CONSTRAINT fk_simplified_area FOREIGN KEY (area_id) REFERENCES administrative_area(area_id) ON DELETE CASCADE
+);
+
 -- Emergency Facilities (from OSM)
 CREATE TABLE facility (
     facility_id SERIAL PRIMARY KEY,
+    osm_type VARCHAR(8),
     osm_id BIGINT,
     name_fac VARCHAR(255),
     facility_type VARCHAR(50) NOT NULL,
-    geom GEOMETRY(Point, 3857) NOT NULL
+    geom GEOMETRY(Point, 3857) NOT NULL,
+    geog GEOGRAPHY(Point, 4326) GENERATED ALWAYS AS (ST_Transform(geom, 4326)::geography) STORED
+);
+
+
+-- Derived Tables
+
+-- Active need and offer counts per administrative area and category.
+-- Kept up to date by the trg_need_area_stats / trg_offer_area_stats triggers
+-- (also across ETL loads, since areas keep their area_id); refresh_area_stats() rebuilds it from scratch.
+CREATE TABLE area_stats (
+    area_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    need_count INTEGER NOT NULL DEFAULT 0,
+    offer_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (area_id, category_id),
+    CONSTRAINT fk_area_stats_area FOREIGN KEY (area_id) REFERENCES administrative_area(area_id) ON DELETE CASCADE,
+    CONSTRAINT fk_area_stats_category FOREIGN KEY (category_id) REFERENCES category(category_id) ON DELETE CASCADE
+);
+
+-- ETL Loads (one row per completed ETL load)
+CREATE TABLE etl_load (
+    etl_load_id SERIAL PRIMARY KEY,
+    finished_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Tombstones (deleted needs/offers, for the API delta sync)
+CREATE TABLE tombstone (
+    tombstone_id SERIAL PRIMARY KEY,
+    table_name VARCHAR(20) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    xact_id XID8 NOT NULL DEFAULT pg_current_xact_id()
+);
+
+-- Highest xact_id of the tombstones purged by the ETL (at most one row);
+-- /changes cursors at or below it may have missed deletions and get 410
+CREATE TABLE tombstone_purge (
+    purged_xact_id XID8 NOT NULL
 );
 
 
@@ -159,17 +264,59 @@ CREATE INDEX idx_offer_geom ON offer USING GIST (geom);
 -- filtering by administrative area (e.g., "needs in Lisbon")
 CREATE INDEX idx_admin_area_geom ON administrative_area USING GIST (geom);
 
+-- distance queries in true metres (ST_DWithin/ST_Distance on geography).
+-- geog is a stored copy of geom, so no ST_Transform runs per row at query time
+CREATE INDEX idx_need_geog ON need USING GIST (geog);
+CREATE INDEX idx_offer_geog ON offer USING GIST (geog);
+CREATE INDEX idx_facility_geog ON facility USING GIST (geog);
+
+-- point-in-polygon tests against the subdivided areas
+CREATE INDEX idx_admin_area_subdivided_geom ON administrative_area_subdivided USING GIST (geom);
+CREATE INDEX idx_admin_area_subdivided_area ON administrative_area_subdivided (area_id);
+
 -- finding nearby facilities (e.g., "hospitals near a need")
 CREATE INDEX idx_facility_geom ON facility USING GIST (geom);
 
+-- OSM key of a facility, used by the ETL to sync facilities in place (sync_facility_load()).
+-- OSM ids are only unique per element type, so a node and a way can share one
+CREATE UNIQUE INDEX idx_facility_osm ON facility (osm_type, osm_id, facility_type);
+
+-- filtering needs and offers by containing area without a spatial test.
+-- municipality_id/parish_id have no foreign key on purpose: the ETL replaces
+-- administrative_area with a new table on each load (swap_reference_load())
+CREATE INDEX idx_need_municipality ON need (municipality_id);
+CREATE INDEX idx_need_parish ON need (parish_id);
+CREATE INDEX idx_offer_municipality ON offer (municipality_id);
+CREATE INDEX idx_offer_parish ON offer (parish_id);
+
+-- latest change (Last-Modified validator)
+CREATE INDEX idx_need_updated_at ON need (updated_at);
+CREATE INDEX idx_offer_updated_at ON offer (updated_at);
+
+-- rows changed since a /changes cursor and the latest writing transaction (ETag validator).
+-- Transaction IDs follow commits closely enough for a snapshot cursor, unlike updated_at,
+-- which is the start time of a transaction that may commit much later
+CREATE INDEX idx_need_xact_id ON need (xact_id);
+CREATE INDEX idx_offer_xact_id ON offer (xact_id);
+
+-- deletions since a cursor (/changes), the latest deletion per table (validators) and the purge
+CREATE INDEX idx_tombstone_deleted_at ON tombstone (table_name, deleted_at);
+CREATE INDEX idx_tombstone_xact_id ON tombstone (table_name, xact_id);
+
 -- triggers for updated_at timestamps
 
 
--- Function to update timestamp
+-- Function to update timestamp and the ID of the writing transaction (used by /changes and ETags)
+-- Maintenance updates (assign_admin_areas) set hazard.skip_change_tracking for their transaction
+-- so they neither stamp the rows as changed nor notify the API
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
 BEGIN
+    IF current_setting('hazard.skip_change_tracking', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
     NEW.updated_at = NOW();
+    NEW.xact_id = pg_current_xact_id();
     RETURN NEW;
 END;
 $$ language 'plpgsql';
@@ -275,3 +422,454 @@ CREATE TRIGGER trg_prevent_invalid_assignment
 BEFORE INSERT ON assignments
 FOR EACH ROW
 EXECUTE FUNCTION prevent_invalid_assignment();
+
+
+-- Reference layers are reloaded without downtime: the ETL fills *_load shadow tables
+-- while the API keeps reading the live ones. Areas keep their area_id across loads,
+-- swap_reference_load() only renames tables, assign_admin_areas() then moves the
+-- needs and offers whose area changed, and sync_facility_load() applies only the
+-- facility changes.
+
+-- Creates empty shadow tables for administrative areas and facilities (used by the ETL before inserting)
+CREATE OR REPLACE FUNCTION begin_reference_load()
+RETURNS VOID AS $$
+BEGIN
+  DROP TABLE IF EXISTS administrative_area_simplified_load, administrative_area_subdivided_load,
+                       administrative_area_load, facility_load;
+
+  -- area_id is left empty by the load and assigned by prepare_reference_load(); indexes are built after the load
+  CREATE TABLE administrative_area_load (LIKE administrative_area INCLUDING CONSTRAINTS);
+  ALTER TABLE administrative_area_load ALTER COLUMN area_id DROP NOT NULL;
+  -- Only the synced columns: facility_id is assigned by facility itself
+  CREATE TABLE facility_load AS
+  SELECT osm_type, osm_id, name_fac, facility_type, geom FROM facility WITH NO DATA;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Assigns area IDs to the loaded areas, indexes the shadow tables and builds their subdivided pieces
+-- (at most p_max_vertices vertices each) and simplified bands (p_tolerances in metres), so the swap only renames tables
+CREATE OR REPLACE FUNCTION prepare_reference_load(p_max_vertices INTEGER, p_tolerances INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+  -- Areas keep the area_id of the live area with the same (name_area, admin_level), so clients' IDs,
+  -- area_stats and the needs/offers in unchanged areas stay valid. Parish names repeat across
+  -- municipalities, so duplicates are paired by the distance between their interior points.
+  WITH candidates AS (
+    SELECT l.ctid AS load_row, a.area_id,
+           ST_Distance(ST_PointOnSurface(l.geom), ST_PointOnSurface(a.geom)) AS distance
+    FROM administrative_area_load l
+    JOIN administrative_area a ON a.name_area = l.name_area AND a.admin_level = l.admin_level
+  ), nearest AS (
+    SELECT DISTINCT ON (load_row) load_row, area_id, distance
+    FROM candidates
+    ORDER BY load_row, distance
+  ), matches AS (
+    SELECT DISTINCT ON (area_id) load_row, area_id
+    FROM nearest
+    ORDER BY area_id, distance
+  )
+  UPDATE administrative_area_load l
+  SET area_id = m.area_id
+  FROM matches m
+  WHERE l.ctid = m.load_row;
+
+  -- Only new areas take an ID from the sequence
+  UPDATE administrative_area_load
+  SET area_id = nextval('administrative_area_area_id_seq')
+  WHERE area_id IS NULL;
+  ALTER TABLE administrative_area_load
+    ALTER COLUMN area_id SET DEFAULT nextval('administrative_area_area_id_seq'),
+    ALTER COLUMN area_id SET NOT NULL;
+
+  ALTER TABLE administrative_area_load ADD CONSTRAINT administrative_area_load_pkey PRIMARY KEY (area_id);
+  CREATE INDEX idx_admin_area_geom_load ON administrative_area_load USING GIST (geom);
+
+  CREATE TABLE administrative_area_subdivided_load (LIKE administrative_area_subdivided INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+  INSERT INTO administrative_area_subdivided_load (area_id, admin_level, geom)
+  SELECT area_id, admin_level, ST_Subdivide(geom, p_max_vertices)
+  FROM administrative_area_load;
+  ALTER TABLE administrative_area_subdivided_load
+    ADD CONSTRAINT administrative_area_subdivided_load_pkey PRIMARY KEY (piece_id),
+    ADD CONSTRAINT fk_subdivided_area_load FOREIGN KEY (area_id) REFERENCES administrative_area_load(area_id) ON DELETE CASCADE;
+  CREATE INDEX idx_admin_area_subdivided_geom_load ON administrative_area_subdivided_load USING GIST (geom);
+  CREATE INDEX idx_admin_area_subdivided_area_load ON administrative_area_subdivided_load (area_id);
+
+  CREATE TABLE administrative_area_simplified_load (LIKE administrative_area_simplified INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+  INSERT INTO administrative_area_simplified_load (area_id, tolerance_m, geom)
+  SELECT a.area_id, t.tolerance_m, ST_Transform(ST_SimplifyPreserveTopology(a.geom, t.tolerance_m), 4326)
+  FROM administrative_area_load a
+  CROSS JOIN unnest(p_tolerances) AS t(tolerance_m);
+  ALTER TABLE administrative_area_simplified_load
+    ADD CONSTRAINT administrative_area_simplified_load_pkey PRIMARY KEY (area_id, tolerance_m),
+    ADD CONSTRAINT fk_simplified_area_load FOREIGN KEY (area_id) REFERENCES administrative_area_load(area_id) ON DELETE CASCADE;
+
+  ANALYZE administrative_area_load;
+  ANALYZE facility_load;
+  ANALYZE administrative_area_subdivided_load;
+  ANALYZE administrative_area_simplified_load;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Replaces the live administrative area tables with the prepared shadow tables in a single transaction.
+-- It only renames tables, so the exclusive locks are short; needs and offers are reassigned afterwards
+-- with assign_admin_areas(), in its own transaction
+CREATE OR REPLACE FUNCTION swap_reference_load()
+RETURNS VOID AS $$
+BEGIN
+  -- The sequences are shared with the shadow tables and would otherwise be dropped with the live ones
+  ALTER SEQUENCE administrative_area_area_id_seq OWNED BY administrative_area_load.area_id;
+  ALTER SEQUENCE administrative_area_subdivided_piece_id_seq OWNED BY administrative_area_subdivided_load.piece_id;
+
+  DROP TABLE administrative_area_simplified, administrative_area_subdivided;
+  -- CASCADE only drops fk_area_stats_area, added back below
+  DROP TABLE administrative_area CASCADE;
+
+  ALTER TABLE administrative_area_load RENAME TO administrative_area;
+  ALTER TABLE administrative_area RENAME CONSTRAINT administrative_area_load_pkey TO administrative_area_pkey;
+  ALTER INDEX idx_admin_area_geom_load RENAME TO idx_admin_area_geom;
+
+  ALTER TABLE administrative_area_subdivided_load RENAME TO administrative_area_subdivided;
+  ALTER TABLE administrative_area_subdivided RENAME CONSTRAINT administrative_area_subdivided_load_pkey TO administrative_area_subdivided_pkey;
+  ALTER TABLE administrative_area_subdivided RENAME CONSTRAINT fk_subdivided_area_load TO fk_subdivided_area;
+  ALTER INDEX idx_admin_area_subdivided_geom_load RENAME TO idx_admin_area_subdivided_geom;
+  ALTER INDEX idx_admin_area_subdivided_area_load RENAME TO idx_admin_area_subdivided_area;
+
+  ALTER TABLE administrative_area_simplified_load RENAME TO administrative_area_simplified;
+  ALTER TABLE administrative_area_simplified RENAME CONSTRAINT administrative_area_simplified_load_pkey TO administrative_area_simplified_pkey;
+  ALTER TABLE administrative_area_simplified RENAME CONSTRAINT fk_simplified_area_load TO fk_simplified_area;
+
+  -- Statistics of the areas that kept their ID stay valid; those of removed areas are dropped
+  DELETE FROM area_stats s
+  WHERE NOT EXISTS (SELECT 1 FROM administrative_area a WHERE a.area_id = s.area_id);
+  ALTER TABLE area_stats
+    ADD CONSTRAINT fk_area_stats_area FOREIGN KEY (area_id) REFERENCES administrative_area(area_id) ON DELETE CASCADE;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Applies facility_load to facility by (osm_type, osm_id, facility_type): missing facilities are deleted,
+-- new ones inserted and renamed or moved ones updated, so unchanged rows keep their facility_id
+-- and are not written. Drops facility_load and returns the number of rows of each kind, plus the
+-- repeated keys of facility_load that were skipped.
+CREATE OR REPLACE FUNCTION sync_facility_load()
+RETURNS TABLE (inserted INTEGER, updated INTEGER, deleted INTEGER, duplicates INTEGER) AS $$
+BEGIN
+  SELECT COUNT(*) - COUNT(DISTINCT (osm_type, osm_id, facility_type))
+  INTO duplicates
+  FROM facility_load
+  WHERE osm_id IS NOT NULL;
+
+  DELETE FROM facility f
+  WHERE NOT EXISTS (
+    SELECT 1 FROM facility_load l
+    WHERE l.osm_type = f.osm_type AND l.osm_id = f.osm_id AND l.facility_type = f.facility_type
+  );
+  GET DIAGNOSTICS deleted = ROW_COUNT;
+
+  -- Only new or changed rows reach the upsert, so unchanged ones do not use up facility_id values
+  WITH upserted AS (
+    INSERT INTO facility (osm_type, osm_id, name_fac, facility_type, geom)
+    SELECT l.osm_type, l.osm_id, l.name_fac, l.facility_type, l.geom
+    FROM (
+      SELECT DISTINCT ON (osm_type, osm_id, facility_type) osm_type, osm_id, name_fac, facility_type, geom
+      FROM facility_load
+      WHERE osm_id IS NOT NULL
+      ORDER BY osm_type, osm_id, facility_type
+    ) l
+    LEFT JOIN facility f
+      ON f.osm_type = l.osm_type AND f.osm_id = l.osm_id AND f.facility_type = l.facility_type
+    WHERE f.facility_id IS NULL
+       OR f.name_fac IS DISTINCT FROM l.name_fac
+       OR NOT ST_Equals(f.geom, l.geom)
+    ON CONFLICT (osm_type, osm_id, facility_type) DO UPDATE
+    SET name_fac = EXCLUDED.name_fac,
+        geom = EXCLUDED.geom
+    RETURNING (xmax = 0) AS is_insert
+  )
+  SELECT COUNT(*) FILTER (WHERE is_insert), COUNT(*) FILTER (WHERE NOT is_insert)
+  INTO inserted, updated
+  FROM upserted;
+
+  DROP TABLE facility_load;
+  RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Returns the administrative area of the given level that contains a point.
+-- Uses the subdivided pieces; ST_Intersects also matches points on the internal cut lines between pieces
+CREATE OR REPLACE FUNCTION containing_area_id(p_geom GEOMETRY, p_admin_level INTEGER)
+RETURNS INTEGER AS $$
+  SELECT area_id
+  FROM administrative_area_subdivided
+  WHERE admin_level = p_admin_level
+    AND ST_Intersects(p_geom, geom)
+  LIMIT 1;
+$$ LANGUAGE sql STABLE;
+
+
+-- Trigger to store the containing municipality and parish of a need/offer when it is created or moved
+CREATE OR REPLACE FUNCTION set_admin_area_ids()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.municipality_id := containing_area_id(NEW.geom, 6);
+  NEW.parish_id := containing_area_id(NEW.geom, 8);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_need_admin_areas ON need;
+CREATE TRIGGER trg_need_admin_areas
+BEFORE INSERT OR UPDATE OF geom ON need
+FOR EACH ROW
+EXECUTE FUNCTION set_admin_area_ids();
+
+DROP TRIGGER IF EXISTS trg_offer_admin_areas ON offer;
+CREATE TRIGGER trg_offer_admin_areas
+BEFORE INSERT OR UPDATE OF geom ON offer
+FOR EACH ROW
+EXECUTE FUNCTION set_admin_area_ids();
+
+
+-- Recomputes municipality_id/parish_id of every need and offer (used by the ETL after swap_reference_load()).
+-- Only rows whose area changed are updated; area_stats follows through its triggers, while
+-- updated_at/xact_id and the map_changes notifications are left alone (the map output is unchanged)
+CREATE OR REPLACE FUNCTION assign_admin_areas()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM set_config('hazard.skip_change_tracking', 'on', true);
+
+  UPDATE need n
+  SET municipality_id = areas.municipality_id,
+      parish_id = areas.parish_id
+  FROM (
+    SELECT need_id,
+           containing_area_id(geom, 6) AS municipality_id,
+           containing_area_id(geom, 8) AS parish_id
+    FROM need
+  ) areas
+  WHERE areas.need_id = n.need_id
+    AND (n.municipality_id, n.parish_id) IS DISTINCT FROM (areas.municipality_id, areas.parish_id);
+
+  UPDATE offer o
+  SET municipality_id = areas.municipality_id,
+      parish_id = areas.parish_id
+  FROM (
+    SELECT offer_id,
+           containing_area_id(geom, 6) AS municipality_id,
+           containing_area_id(geom, 8) AS parish_id
+    FROM offer
+  ) areas
+  WHERE areas.offer_id = o.offer_id
+    AND (o.municipality_id, o.parish_id) IS DISTINCT FROM (areas.municipality_id, areas.parish_id);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Adds need/offer deltas to the area_stats row of one area
+CREATE OR REPLACE FUNCTION apply_area_stats_delta(p_area_id INTEGER, p_category INTEGER, p_need_delta INTEGER, p_offer_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  IF p_area_id IS NULL THEN
+    RETURN;
+  END IF;
+
+  -- The area may be gone while the ETL reloads administrative_area
+  INSERT INTO area_stats (area_id, category_id, need_count, offer_count)
+  SELECT a.area_id, p_category, p_need_delta, p_offer_delta
+  FROM administrative_area a
+  WHERE a.area_id = p_area_id
+  ON CONFLICT (area_id, category_id) DO UPDATE
+  SET need_count  = area_stats.need_count  + EXCLUDED.need_count,
+      offer_count = area_stats.offer_count + EXCLUDED.offer_count;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Trigger to keep area_stats in sync when an active need/offer is created, moved, recategorised, changes status or is deleted
+CREATE OR REPLACE FUNCTION sync_area_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  active_id INTEGER;
+  need_delta INTEGER := 0;
+  offer_delta INTEGER := 0;
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.status_id = NEW.status_id
+     AND OLD.category = NEW.category
+     AND OLD.municipality_id IS NOT DISTINCT FROM NEW.municipality_id
+     AND OLD.parish_id IS NOT DISTINCT FROM NEW.parish_id THEN
+    RETURN NULL;
+  END IF;
+
+  SELECT status_id INTO active_id FROM status_domain WHERE code = 'active';
+
+  IF TG_TABLE_NAME = 'need' THEN
+    need_delta := 1;
+  ELSE
+    offer_delta := 1;
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status_id = active_id THEN
+    PERFORM apply_area_stats_delta(OLD.municipality_id, OLD.category, -need_delta, -offer_delta);
+    PERFORM apply_area_stats_delta(OLD.parish_id, OLD.category, -need_delta, -offer_delta);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status_id = active_id THEN
+    PERFORM apply_area_stats_delta(NEW.municipality_id, NEW.category, need_delta, offer_delta);
+    PERFORM apply_area_stats_delta(NEW.parish_id, NEW.category, need_delta, offer_delta);
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- geom is listed because municipality_id/parish_id are changed by the BEFORE trigger, not by the UPDATE itself
+DROP TRIGGER IF EXISTS trg_need_area_stats ON need;
+CREATE TRIGGER trg_need_area_stats
+AFTER INSERT OR DELETE OR UPDATE OF status_id, category, geom, municipality_id, parish_id ON need
+FOR EACH ROW
+EXECUTE FUNCTION sync_area_stats();
+
+DROP TRIGGER IF EXISTS trg_offer_area_stats ON offer;
+CREATE TRIGGER trg_offer_area_stats
+AFTER INSERT OR DELETE OR UPDATE OF status_id, category, geom, municipality_id, parish_id ON offer
+FOR EACH ROW
+EXECUTE FUNCTION sync_area_stats();
+
+
+-- Rebuilds area_stats from scratch (e.g. after editing needs/offers with the triggers disabled)
+CREATE OR REPLACE FUNCTION refresh_area_stats()
+RETURNS VOID AS $$
+DECLARE
+  active_id INTEGER;
+BEGIN
+  SELECT status_id INTO active_id FROM status_domain WHERE code = 'active';
+
+  DELETE FROM area_stats;
+
+  INSERT INTO area_stats (area_id, category_id, need_count, offer_count)
+  SELECT area_id, category, SUM(need_count), SUM(offer_count)
+  FROM (
+    SELECT area_id, n.category, 1 AS need_count, 0 AS offer_count
+    FROM need n, unnest(ARRAY[n.municipality_id, n.parish_id]) AS area_id
+    WHERE n.status_id = active_id
+    UNION ALL
+    SELECT area_id, o.category, 0 AS need_count, 1 AS offer_count
+    FROM offer o, unnest(ARRAY[o.municipality_id, o.parish_id]) AS area_id
+    WHERE o.status_id = active_id
+  ) counts
+  WHERE area_id IN (SELECT area_id FROM administrative_area)
+  GROUP BY area_id, category;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Publishes need/offer/assignment changes and completed ETL loads on the map_changes channel (LISTEN/NOTIFY) so API processes can refresh in-memory state
+CREATE OR REPLACE FUNCTION notify_map_change()
+RETURNS TRIGGER AS $$
+DECLARE
+  row_data JSONB;
+BEGIN
+  IF current_setting('hazard.skip_change_tracking', true) = 'on' THEN
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'DELETE' THEN
+    row_data := to_jsonb(OLD);
+  ELSE
+    row_data := to_jsonb(NEW);
+  END IF;
+
+  PERFORM pg_notify('map_changes', json_build_object(
+    'table', TG_TABLE_NAME,
+    'op',    TG_OP,
+    'id',    (row_data ->> (CASE TG_TABLE_NAME WHEN 'assignments' THEN 'assignment_id' ELSE TG_TABLE_NAME || '_id' END))::INTEGER
+  )::TEXT);
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_need_notify_change ON need;
+CREATE TRIGGER trg_need_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON need
+FOR EACH ROW
+EXECUTE FUNCTION notify_map_change();
+
+DROP TRIGGER IF EXISTS trg_offer_notify_change ON offer;
+CREATE TRIGGER trg_offer_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON offer
+FOR EACH ROW
+EXECUTE FUNCTION notify_map_change();
+
+DROP TRIGGER IF EXISTS trg_assignments_notify_change ON assignments;
+CREATE TRIGGER trg_assignments_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON assignments
+FOR EACH ROW
+EXECUTE FUNCTION notify_map_change();
+
+DROP TRIGGER IF EXISTS trg_etl_load_notify_change ON etl_load;
+CREATE TRIGGER trg_etl_load_notify_change
+AFTER INSERT ON etl_load
+FOR EACH ROW
+EXECUTE FUNCTION notify_map_change();
+
+
+-- IDs (comma-separated) of the transactions still running that started before p_xact_id.
+-- When one of them commits, rows with an xact_id below the latest one become visible,
+-- so they are part of the API's data versions (ETag)
+CREATE OR REPLACE FUNCTION running_xacts_before(p_xact_id XID8)
+RETURNS TEXT AS $$
+  SELECT string_agg(x::text, ',' ORDER BY x)
+  FROM pg_snapshot_xip(pg_current_snapshot()) AS x
+  WHERE x < p_xact_id;
+$$ LANGUAGE sql STABLE;
+
+
+-- Deletes tombstones older than p_retention_days and records the highest purged xact_id
+-- in tombstone_purge (used by the ETL after each load)
+CREATE OR REPLACE FUNCTION purge_tombstones(p_retention_days INTEGER)
+RETURNS VOID AS $$
+DECLARE
+  purged XID8;
+BEGIN
+  WITH deleted AS (
+    DELETE FROM tombstone
+    WHERE deleted_at < NOW() - make_interval(days => p_retention_days)
+    RETURNING xact_id
+  )
+  SELECT xact_id INTO purged FROM deleted ORDER BY xact_id DESC LIMIT 1;
+
+  IF purged IS NOT NULL THEN
+    DELETE FROM tombstone_purge WHERE purged_xact_id < purged;
+    INSERT INTO tombstone_purge (purged_xact_id)
+    SELECT purged WHERE NOT EXISTS (SELECT 1 FROM tombstone_purge);
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Records deleted needs/offers (direct deletes and account deletion cascades) so clients can drop them
+CREATE OR REPLACE FUNCTION record_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO tombstone (table_name, row_id)
+  VALUES (TG_TABLE_NAME, (to_jsonb(OLD) ->> (TG_TABLE_NAME || '_id'))::INTEGER);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_need_tombstone ON need;
+CREATE TRIGGER trg_need_tombstone
+AFTER DELETE ON need
+FOR EACH ROW
+EXECUTE FUNCTION record_tombstone();
+
+DROP TRIGGER IF EXISTS trg_offer_tombstone ON offer;
+CREATE TRIGGER trg_offer_tombstone
+AFTER DELETE ON offer
+FOR EACH ROW
+EXECUTE FUNCTION record_tombstone();
@@ -1,5 +1,5 @@
 from .logs import die, info, init_logger, section, progress_bar
-from .ds import write_geojson, read_gpkg, download_data, extract_osm_data, get_latest_caop_url
+from .ds import write_geojson, read_gpkg, download_data, extract_osm_data, extract_osm_facilities, get_latest_caop_url, RateLimiter
 from .config import read_config
 from .dbController import DBController
 
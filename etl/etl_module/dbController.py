@@ -1,4 +1,5 @@
-from .logs import die, info
+from .logs import die, info, progress_bar
+import io
 import sqlalchemy as sql
 import pandas as pd
 
@@ -31,48 +32,79 @@ class DBController:
             die(f"select_data: {e}")
         return df
 
-    def insert_geodata(self, gdf, schema: str, table: str, srid: int = 3857, chunksize: int = 100) -> None:
-        """Inserts a GeoDataFrame into a PostGIS table using WKT geometry conversion.
+    def execute(self, query: str) -> list:
+        """Executes and commits a statement (e.g. calling a maintenance function)
+
+        Args:
+            query (str): the SQL statement to be executed
+
+        Returns:
+            list: the rows returned by the statement as dicts (empty if it returns none)
+        """
+        try:
+            with self.engine.connect() as con:
+                tran = con.begin()
+                result = con.execute(sql.text(query))
+                rows = [dict(row) for row in result.mappings()] if result.returns_rows else []
+                tran.commit()
+        except Exception as e:
+            die(f"execute: {e}")
+        return rows
+
+    def insert_geodata(self, gdf, schema: str, table: str, srid: int = 3857, chunksize: int = 10000) -> None:
+        """Bulk loads a GeoDataFrame into a PostGIS table with `COPY`.
+
+        Rows are streamed as CSV (geometry as hex WKB) with `COPY ... FROM STDIN`
+        into a temporary staging table, `chunksize` rows per `COPY`, and moved
+        into the target table with a single `INSERT ... SELECT`. Everything runs
+        in one transaction, so a failed load leaves the table untouched.
 
         Args:
             gdf (gpd.GeoDataFrame): geodataframe to insert
             schema (str): the name of the schema
             table (str): the name of the table
             srid (int): the SRID/CRS of the geometry
-            chunksize (int): number of rows to insert at a time
+            chunksize (int): number of rows sent per `COPY`
         """
+        cols = [c for c in gdf.columns if c not in ('geometry', 'id')]
+        col_str = ', '.join(cols)
+        staging = f"staging_{table}"
+
+        frame = pd.DataFrame(gdf[cols])
+        for c in cols:
+            # GeoJSON readers turn integer columns with gaps (e.g. osm_id) into floats,
+            # which COPY would reject for integer columns
+            values = frame[c].dropna()
+            if frame[c].dtype.kind == 'f' and (values == values.round()).all():
+                frame[c] = frame[c].astype('Int64')
+        frame['geom'] = gdf.geometry.to_wkb(hex=True)
+
+        con = self.engine.raw_connection()
         try:
-            with self.engine.connect() as con:
-                tran = con.begin()
-                total = len(gdf)
-                for i in range(0, total, chunksize):
-                    chunk = gdf.iloc[i:i + chunksize]
-                    for _, row in chunk.iterrows():
-                        cols = [c for c in gdf.columns if c not in ('geometry', 'id')]
-                        col_str = ', '.join(cols) + ', geom'
-                        placeholders = ', '.join([f':{c}' for c in cols])
-                        query = sql.text(f"""
-                            INSERT INTO {schema}.{table} ({col_str})
-                            VALUES ({placeholders}, ST_GeomFromText(:wkt, {srid}))
-                        """)
-                        params = {c: row[c] for c in cols}
-                        params['wkt'] = row['geometry'].wkt
-                        con.execute(query, params)
-                    # Dynamic progress bar - bypass logging
-                    current = min(i + chunksize, total)
-                    percent = current / total
-                    filled = int(40 * percent)
-                    bar = '#' * filled + '-' * (40 - filled)
-                    msg = f"[>>] Inserting into {table} [{bar}] {current}/{total} ({percent*100:.0f}%)".ljust(100)
-                    if current == total:
-                        print(f"\r{msg}")
-                    else:
-                        print(f"\r{msg}", end='', flush=True)
-                tran.commit()
+            cursor = con.cursor()
+            cursor.execute(f"""
+                CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+                SELECT {col_str}, NULL::text AS geom FROM {schema}.{table} WITH NO DATA
+            """)
+            total = len(frame)
+            for i in range(0, total, chunksize):
+                buffer = io.StringIO()
+                # Explicit \N marker: COPY csv would otherwise read empty strings as NULL
+                frame.iloc[i:i + chunksize].to_csv(buffer, index=False, header=False, na_rep='\\N')
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {staging} ({col_str}, geom) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+                progress_bar(min(i + chunksize, total), total, prefix=f"Copying into {table}")
+            cursor.execute(f"""
+                INSERT INTO {schema}.{table} ({col_str}, geom)
+                SELECT {col_str}, ST_GeomFromWKB(decode(geom, 'hex'), {srid})
+                FROM {staging}
+            """)
+            con.commit()
         except Exception as e:
-            if 'tran' in locals():
-                tran.rollback()
+            con.rollback()
             die(f"insert_geodata: {e}")
+        finally:
+            con.close()
 
     def truncate_tables(self, tables: list) -> None:
         """Truncates the given tables and restarts their identity sequences.
@@ -2,8 +2,13 @@ from .logs import die, info
 import requests
 import geopandas as gpd
 import json
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import urlparse
 
 
 def get_latest_caop_url() -> tuple[str, str]:
@@ -90,27 +95,97 @@ def write_geojson(gdf: gpd.GeoDataFrame, fname: str) -> None:
         die(f"write_geojson: {e}")
 
 
-def extract_osm_data(tags: list, overpass_url: str, delay: int = 5, attempts: int = 6) -> gpd.GeoDataFrame:
+class RateLimiter:
+    """Token bucket shared by concurrent requests, with a concurrency cap per host.
+
+    Tokens refill at `rate` per second up to `burst`, and each request takes
+    one. At most `per_host` requests run at once against the same host, which
+    matches the request slots Overpass gives each client.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 2, per_host: int = 2):
+        """
+        Args:
+            rate (float): requests per second allowed on average
+            burst (int): requests that may start back to back
+            per_host (int): max concurrent requests per host
+        """
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _take_token(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self, url: str):
+        """Waits for a host slot and a token, and holds the slot for the request.
+
+        Args:
+            url (str): request URL, whose host is used for the concurrency cap
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._hosts.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            self._take_token()
+            yield
+
+
+def extract_osm_data(tags, overpass_url: str, delay: int = 5, attempts: int = 6,
+                     limiter: RateLimiter = None) -> gpd.GeoDataFrame:
     """Extracts data from OpenStreetMap using Overpass API, filtered to Portugal.
 
+    In union mode (`tags` is a dict of tag lists per facility type) all tag
+    sets are fetched with one query, resolving the Portugal area only once.
+    Each element is then classified client-side into every facility type
+    whose tags it has, so the rows match those of one query per type.
+
     Args:
-        tags (list): list of OSM tags like ['amenity=hospital']
+        tags (list | dict): list of OSM tags like ['amenity=hospital'], or
+            {facility_type: list of tags} for union mode
         overpass_url (str): Overpass API endpoint
-        delay (int): delay between requests in seconds
+        delay (int): base delay of the retry backoff in seconds; without a
+            limiter, also the pause after a successful request
         attempts (int): number of attempts to access the Overpass API
+        limiter (RateLimiter): optional limiter shared by concurrent calls
 
     Returns:
-        gpd.GeoDataFrame: geodataframe with OSM features
+        gpd.GeoDataFrame: geodataframe with OSM features (with a `facility_type`
+            column in union mode)
     """
     try:
-        tag_string = ''.join([f'["{k}"="{v}"]' for tag in tags for k, v in [tag.split('=')]])
+        union = isinstance(tags, dict)
+        tag_sets = tags if union else {None: tags}
+        tag_pairs = {
+            facility_type: [tag.split('=') for tag in tag_list]
+            for facility_type, tag_list in tag_sets.items()
+        }
+        selectors = []
+        for pairs in tag_pairs.values():
+            tag_string = ''.join([f'["{k}"="{v}"]' for k, v in pairs])
+            selectors.append(f"node{tag_string}(area.portugal);")
+            selectors.append(f"way{tag_string}(area.portugal);")
+        selectors = "\n        ".join(selectors)
 
         query = f"""
         [out:json][timeout:300];
         area["name"="Portugal"]["admin_level"="2"]->.portugal;
         (
-        node{tag_string}(area.portugal);
-        way{tag_string}(area.portugal);
+        {selectors}
         ) -> .all;
         (
         node.all(36.8,-9.6,42.2,-6.1);
@@ -120,14 +195,19 @@ def extract_osm_data(tags: list, overpass_url: str, delay: int = 5, attempts: in
         """
         for attempt in range(attempts):
             try:
-                response = requests.post(overpass_url, data={'data': query}, timeout=300)
+                if limiter is not None:
+                    with limiter.slot(overpass_url):
+                        response = requests.post(overpass_url, data={'data': query}, timeout=300)
+                else:
+                    response = requests.post(overpass_url, data={'data': query}, timeout=300)
                 response.raise_for_status()
                 data = response.json()
                 break
             except Exception as e:
                 if attempt < attempts -1:
-                    wait = delay * (attempt + 1)
-                    info(f"Overpass timeout (attempt {attempt+1}/{attempts}), retrying in {wait}s...")
+                    # Full jitter, so concurrent workers do not retry in lockstep
+                    wait = random.uniform(0, delay * 2 ** attempt)
+                    info(f"Overpass error (attempt {attempt+1}/{attempts}), retrying in {wait:.1f}s...")
                     time.sleep(wait)
                 else:
                     raise e
@@ -145,13 +225,20 @@ def extract_osm_data(tags: list, overpass_url: str, delay: int = 5, attempts: in
                 continue
 
             tags_dict = elem.get('tags', {})
-            features.append({
+            feature = {
+                'osm_type': elem['type'],
                 'osm_id': elem['id'],
                 'name': tags_dict.get('name', ''),
                 'lon': lon,
                 'lat': lat,
                 'tags': json.dumps(tags_dict)
-            })
+            }
+            if not union:
+                features.append(feature)
+                continue
+            for facility_type, pairs in tag_pairs.items():
+                if all(tags_dict.get(k) == v for k, v in pairs):
+                    features.append(dict(feature, facility_type=facility_type))
 
         if not features:
             return None
@@ -163,8 +250,54 @@ def extract_osm_data(tags: list, overpass_url: str, delay: int = 5, attempts: in
             crs='EPSG:4326'
         )
 
-        time.sleep(delay)
+        if limiter is None:
+            time.sleep(delay)
         return gdf
 
     except Exception as e:
         die(f"extract_osm_data: {e}")
+
+
+def extract_osm_facilities(facility_tags: dict, overpass_url: str, max_workers: int = 2,
+                           rate: float = 0.5, burst: int = 2, mode: str = "per_type") -> dict:
+    """Extracts every facility type from Overpass.
+
+    In `per_type` mode each type has its own query; the queries run in a
+    thread pool and share one RateLimiter, so wall time is close to the
+    slowest query instead of the sum of all of them. In `union` mode a single
+    query fetches every type (see `extract_osm_data`).
+
+    Args:
+        facility_tags (dict): `osm.facility_tags` of the config, {category: {facility_type: tags}}
+        overpass_url (str): Overpass API endpoint
+        max_workers (int): number of threads, also the concurrency cap per host
+        rate (float): requests per second allowed on average
+        burst (int): requests that may start back to back
+        mode (str): 'per_type' or 'union'
+
+    Returns:
+        dict: {facility_type: gpd.GeoDataFrame or None}, in config order
+    """
+    limiter = RateLimiter(rate=rate, burst=burst, per_host=max_workers)
+    jobs = {
+        facility_type: tags
+        for facilities in facility_tags.values()
+        for facility_type, tags in facilities.items()
+    }
+
+    if mode == "union":
+        gdf = extract_osm_data(jobs, overpass_url, limiter=limiter)
+        results = {}
+        for facility_type in jobs:
+            rows = gdf[gdf['facility_type'] == facility_type] if gdf is not None else None
+            results[facility_type] = rows.drop(columns='facility_type') if rows is not None and len(rows) else None
+        return results
+    if mode != "per_type":
+        die(f"extract_osm_facilities: unknown mode '{mode}', expected 'per_type' or 'union'")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            facility_type: pool.submit(extract_osm_data, tags, overpass_url, limiter=limiter)
+            for facility_type, tags in jobs.items()
+        }
+        return {facility_type: future.result() for facility_type, future in futures.items()}
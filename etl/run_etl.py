@@ -8,9 +8,22 @@ import pandas as pd
 DB_SCHEMA = "public"
 TABLE_ADMIN_AREAS = "administrative_area"
 TABLE_FACILITIES = "facility"
+# Suffix of the shadow tables filled by load() before the swap (see begin_reference_load() in db/model.sql)
+LOAD_SUFFIX = "_load"
 BASE_DIR = Path(__file__).resolve().parent
 DOWNLOAD_DIR = BASE_DIR / "data" / "original"
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
+# Max vertices per piece in administrative_area_subdivided
+SUBDIVIDE_MAX_VERTICES = 256
+# Tolerances (metres) of the simplified boundary bands, must match ADMIN_AREA_BANDS in api/run_api.py
+SIMPLIFY_TOLERANCES = [1000, 250, 50, 10]
+# Days of deleted need/offer tombstones kept (older /changes cursors get 410 from the API)
+TOMBSTONE_RETENTION_DAYS = 30
+# Concurrent Overpass queries (overpass-api.de serves 2 at a time per client) and their average rate
+OVERPASS_MAX_WORKERS = 2
+OVERPASS_REQUESTS_PER_SECOND = 0.5
+# 'per_type' (one query per facility type) or 'union' (one query for all of them)
+OVERPASS_QUERY_MODE = "per_type"
 
 
 def extraction(config: dict) -> None:
@@ -39,17 +52,21 @@ def extraction(config: dict) -> None:
     overpass_url = config["osm"]["overpass_url"]
 
     all_facilities = []
-    
-    for category, facilities in config["osm"]["facility_tags"].items():
-        for facility_type, tags in facilities.items():
-            e.info(f"Extracting {facility_type}...")
-            gdf = e.extract_osm_data(tags, overpass_url)
-            if gdf is not None:
-                gdf['facility_type'] = facility_type
-                all_facilities.append(gdf)
-                e.info(f"  -> Found {len(gdf)} {facility_type}")
-            else:
-                e.info(f"  -> No results for {facility_type}")
+
+    results = e.extract_osm_facilities(
+        config["osm"]["facility_tags"],
+        overpass_url,
+        max_workers=config["osm"].get("max_workers", OVERPASS_MAX_WORKERS),
+        rate=config["osm"].get("requests_per_second", OVERPASS_REQUESTS_PER_SECOND),
+        mode=config["osm"].get("query_mode", OVERPASS_QUERY_MODE)
+    )
+    for facility_type, gdf in results.items():
+        if gdf is not None:
+            gdf['facility_type'] = facility_type
+            all_facilities.append(gdf)
+            e.info(f"  -> Found {len(gdf)} {facility_type}")
+        else:
+            e.info(f"  -> No results for {facility_type}")
 
     if all_facilities:
         facilities_gdf = pd.concat(all_facilities, ignore_index=True)
@@ -105,8 +122,8 @@ def transformation(config: dict) -> None:
     e.info("READING FACILITIES DATA")
     facilities = e.read_gpkg(f"{DOWNLOAD_DIR}/facilities_raw.geojson")
 
-    facilities = facilities[['osm_id', 'name', 'facility_type', 'geometry']].copy()
-    facilities.columns = ['osm_id', 'name_fac', 'facility_type', 'geometry']
+    facilities = facilities[['osm_type', 'osm_id', 'name', 'facility_type', 'geometry']].copy()
+    facilities.columns = ['osm_type', 'osm_id', 'name_fac', 'facility_type', 'geometry']
 
     e.info(f"{len(facilities)} facilities ready")
     e.write_geojson(facilities, f"{PROCESSED_DIR}/facility.geojson")
@@ -114,12 +131,12 @@ def transformation(config: dict) -> None:
     e.info("TRANSFORMATION COMPLETED")
 
 
-def load(config: dict, chunksize: int = 1000) -> None:
+def load(config: dict, chunksize: int = 10000) -> None:
     """Runs load
 
     Args:
         config (dict): configuration dictionary
-        chunksize (int): the number of rows to be inserted at one time
+        chunksize (int): the number of rows sent per COPY
     """
     try:
         e.section("LOAD")
@@ -132,15 +149,17 @@ def load(config: dict, chunksize: int = 1000) -> None:
             password=config["database"]["password"]
         )
 
-        e.info("CLEARING EXISTING DATA")
-        db.truncate_tables(["facility", "administrative_area"])
+        # The API keeps reading the live tables until swap_reference_load()
+        e.info("CREATING SHADOW TABLES")
+        db.execute("SELECT begin_reference_load()")
+        e.info("SHADOW TABLES CREATED")
 
         e.info("READING ADMINISTRATIVE AREAS")
         admin_areas = e.read_gpkg(f"{PROCESSED_DIR}/administrative_area.geojson")
         e.info(f"Loaded {len(admin_areas)} administrative areas")
 
         e.info("INSERTING ADMINISTRATIVE AREAS INTO DATABASE")
-        db.insert_geodata(admin_areas, schema=DB_SCHEMA, table=TABLE_ADMIN_AREAS, srid=3857, chunksize=chunksize)
+        db.insert_geodata(admin_areas, schema=DB_SCHEMA, table=f"{TABLE_ADMIN_AREAS}{LOAD_SUFFIX}", srid=3857, chunksize=chunksize)
         e.info("ADMINISTRATIVE AREAS INSERTED")
 
         e.info("READING FACILITIES")
@@ -148,8 +167,42 @@ def load(config: dict, chunksize: int = 1000) -> None:
         e.info(f"Loaded {len(facilities)} facilities")
 
         e.info("INSERTING FACILITIES INTO DATABASE")
-        db.insert_geodata(facilities, schema=DB_SCHEMA, table=TABLE_FACILITIES, srid=3857, chunksize=chunksize)
+        db.insert_geodata(facilities, schema=DB_SCHEMA, table=f"{TABLE_FACILITIES}{LOAD_SUFFIX}", srid=3857, chunksize=chunksize)
         e.info("FACILITIES INSERTED")
+
+        # Indexes, subdivided pieces, simplified bands and ANALYZE, all on the shadow tables
+        e.info("PREPARING SHADOW TABLES")
+        tolerances = ", ".join(str(t) for t in SIMPLIFY_TOLERANCES)
+        db.execute(f"SELECT prepare_reference_load({SUBDIVIDE_MAX_VERTICES}, ARRAY[{tolerances}])")
+        e.info("SHADOW TABLES PREPARED")
+
+        # One short transaction that only renames the shadow tables (area IDs were kept by prepare_reference_load())
+        e.info("SWAPPING IN THE NEW ADMINISTRATIVE AREAS")
+        db.execute("SELECT swap_reference_load()")
+        e.info("ADMINISTRATIVE AREAS SWAPPED")
+
+        # After the swap has committed: only needs and offers whose area changed are updated
+        e.info("REASSIGNING NEEDS AND OFFERS TO ADMINISTRATIVE AREAS")
+        db.execute("SELECT assign_admin_areas()")
+        e.info("NEEDS AND OFFERS REASSIGNED")
+
+        # Facilities are diffed by (osm_type, osm_id, facility_type), so unchanged rows keep their facility_id
+        e.info("SYNCING FACILITIES")
+        delta = db.execute("SELECT * FROM sync_facility_load()")[0]
+        e.info(f"{delta['inserted']} inserted, {delta['updated']} updated, {delta['deleted']} deleted")
+        if delta['duplicates']:
+            e.info(f"{delta['duplicates']} repeated facilities skipped")
+        e.info("FACILITIES SYNCED")
+
+        # The API answers /changes with 410 for cursors older than the purged tombstones
+        e.info("PURGING OLD TOMBSTONES")
+        db.execute(f"SELECT purge_tombstones({TOMBSTONE_RETENTION_DAYS})")
+        e.info("OLD TOMBSTONES PURGED")
+
+        # Notifies the API (map_changes) so cached reference data is dropped
+        e.info("RECORDING ETL LOAD")
+        db.execute("INSERT INTO etl_load DEFAULT VALUES")
+        e.info("ETL LOAD RECORDED")
     except Exception as err:
         e.die(f"LOAD: {err}")
 
@@ -206,7 +259,7 @@ def main(config_file: str) -> None:
     msg = time_this_function(transformation, config=config)
     e.info(msg)
     
-    msg = time_this_function(load, config=config, chunksize=1000)
+    msg = time_this_function(load, config=config, chunksize=10000)
     e.info(msg)
 
 